@@ -4,11 +4,22 @@ Auto-compatible GROBID abstract extractor
 Works with ALL versions of grobid_client_python
 """
 
+import io
 import os
 import argparse
-import xml.etree.ElementTree as ET
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from lxml import etree
 from grobid_client.grobid_client import GrobidClient
 
+try:
+    from blake3 import blake3 as _hash   # SIMD, content identity 용으로 충분
+except ImportError:
+    _hash = hashlib.blake2b
+
+CACHE_DIR = "./grobid_cache"
+
 HTML_TEMPLATE = """
 <html>
 <head>
@@ -30,24 +41,56 @@ HTML_TEMPLATE = """
 """
 
 
-def extract_title_abstract(xml_text):
-    ns = {"tei": "http://www.tei-c.org/ns/1.0"}
-    root = ET.fromstring(xml_text)
+TEI = "{http://www.tei-c.org/ns/1.0}"
+TEI_TITLE = TEI + "title"
+TEI_TITLE_STMT = TEI + "titleStmt"
+TEI_ABSTRACT = TEI + "abstract"
+TEI_P = TEI + "p"
+TEI_DIV = TEI + "div"
+TEI_BIBL = TEI + "biblStruct"
+
 
-    # title
-    t = root.find(".//tei:titleStmt/tei:title", ns)
-    title = t.text.strip() if t is not None and t.text else "No Title"
+def _release(elem):
+    """처리 끝난 element 와 앞쪽 형제들을 해제해서 메모리를 O(element) 로 유지"""
+    elem.clear(keep_tail=True)
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
 
-    # abstract
-    a = root.find(".//tei:abstract", ns)
-    if a is None:
-        abstract = "No Abstract"
+
+def extract_title_abstract(xml_text):
+    if isinstance(xml_text, str):
+        xml_text = xml_text.encode("utf-8")
+
+    title = None
+    abstract_paras = []
+    abstract_text = ""
+
+    # DOM 전체를 만들지 않고 end 이벤트만 스트리밍
+    for _, elem in etree.iterparse(
+        io.BytesIO(xml_text),
+        events=("end",),
+        tag=(TEI_TITLE, TEI_ABSTRACT, TEI_P, TEI_DIV, TEI_BIBL),
+    ):
+        tag = elem.tag
+        if tag == TEI_TITLE:
+            parent = elem.getparent()
+            if title is None and parent is not None and parent.tag == TEI_TITLE_STMT:
+                title = (elem.text or "").strip()
+            continue  # title 은 형제가 적어서 해제 불필요
+        elif tag == TEI_P:
+            if next(elem.iterancestors(TEI_ABSTRACT), None) is not None:
+                abstract_paras.append("".join(elem.itertext()).strip())
+        elif tag == TEI_ABSTRACT:
+            abstract_text = (elem.text or "").strip()
+        _release(elem)
+
+    title = title or "No Title"
+    if abstract_paras:
+        abstract = "\n".join(abstract_paras)
     else:
-        paras = a.findall(".//tei:p", ns)
-        if paras:
-            abstract = "\n".join([(p.text or "").strip() for p in paras])
-        else:
-            abstract = (a.text or "").strip() or "No Abstract"
+        abstract = abstract_text or "No Abstract"
 
     return title, abstract
 
@@ -83,15 +126,66 @@ def safe_process_pdf(client, pdf_path):
         return 200, res
 
 
-def process_pdf(pdf_path, output_html, config_path):
-    client = GrobidClient(config_path=config_path)
+def pdf_digest(pdf_path):
+    """PDF 내용 기반 cache key"""
+    h = _hash()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_cached_tei(key, cache_dir=CACHE_DIR):
+    cache_path = os.path.join(cache_dir, f"{key}.header.tei.xml")
+    if os.path.exists(cache_path):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return f.read()
+    return None
+
+
+def save_cached_tei(key, xml_text, cache_dir=CACHE_DIR):
+    """임시 파일에 쓴 뒤 os.replace 로 atomic 저장"""
+    os.makedirs(cache_dir, exist_ok=True)
+    cache_path = os.path.join(cache_dir, f"{key}.header.tei.xml")
+    tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(xml_text)
+    os.replace(tmp_path, cache_path)
+
+
+# GrobidClient 는 생성 시 서버 체크를 하므로 config 별로 한 번만 만든다
+_CLIENTS = {}
+_CLIENTS_LOCK = threading.Lock()
+
 
+def get_client(config_path):
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(config_path)
+        if client is None:
+            client = GrobidClient(config_path=config_path)
+            _CLIENTS[config_path] = client
+        return client
+
+
+def process_pdf(pdf_path, output_html, config_path, client=None):
     print("🚀 Processing:", pdf_path)
 
-    status, xml_text = safe_process_pdf(client, pdf_path)
+    # 같은 내용의 PDF 는 GROBID 를 다시 돌리지 않음
+    key = pdf_digest(pdf_path)
+    xml_text = load_cached_tei(key)
+
+    if xml_text is None:
+        if client is None:
+            client = get_client(config_path)
+
+        status, xml_text = safe_process_pdf(client, pdf_path)
 
-    if status != 200:
-        raise RuntimeError(f"GROBID returned HTTP {status}")
+        if status != 200:
+            raise RuntimeError(f"GROBID returned HTTP {status}")
+
+        save_cached_tei(key, xml_text)
+    else:
+        print("♻️  Cache hit:", key)
 
     title, abstract = extract_title_abstract(xml_text)
 
@@ -102,17 +196,43 @@ def process_pdf(pdf_path, output_html, config_path):
     print("🎉 Saved:", output_html)
 
 
+def process_pdfs(pdf_paths, out_dir, config_path, max_workers=8):
+    """여러 PDF 를 하나의 client 로 동시에 GROBID 에 제출 (network-bound)"""
+    os.makedirs(out_dir, exist_ok=True)
+    client = get_client(config_path)
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = {}
+        for pdf_path in pdf_paths:
+            stem = os.path.splitext(os.path.basename(pdf_path))[0]
+            output_html = os.path.join(out_dir, stem + ".html")
+            futures[ex.submit(process_pdf, pdf_path, output_html, config_path, client)] = pdf_path
+
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except Exception as e:
+                print("❌ Failed:", futures[fut], e)
+                failed.append(futures[fut])
+
+    return failed
+
+
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("--pdf", required=True)
-    parser.add_argument("--output", required=True)
+    parser.add_argument("--pdf", required=True, nargs="+")
+    parser.add_argument("--output", required=True,
+                        help="output html (single pdf) or output directory (multiple pdfs)")
     parser.add_argument("--config", default="./config.json")
+    parser.add_argument("--workers", type=int, default=8)
     args = parser.parse_args()
 
-    process_pdf(args.pdf, args.output, args.config)
+    if len(args.pdf) == 1 and not os.path.isdir(args.output):
+        process_pdf(args.pdf[0], args.output, args.config)
+    else:
+        process_pdfs(args.pdf, args.output, args.config, max_workers=args.workers)
 
 
 if __name__ == "__main__":
     main()
-
-
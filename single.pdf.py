@@ -1,23 +1,84 @@
+import argparse
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 from grobid_client.grobid_client import GrobidClient
 from lxml import etree
 
+try:
+    from blake3 import blake3 as _hash   # SIMD, content identity 용으로 충분
+except ImportError:
+    _hash = hashlib.blake2b
+
+CACHE_DIR = "./grobid_cache"
+
+TEI = "{http://www.tei-c.org/ns/1.0}"
+TEI_TITLE = TEI + "title"
+TEI_TITLE_STMT = TEI + "titleStmt"
+TEI_ABSTRACT = TEI + "abstract"
+TEI_BODY = TEI + "body"
+TEI_P = TEI + "p"
+TEI_DIV = TEI + "div"
+TEI_BIBL = TEI + "biblStruct"
+
+
+def _release(elem):
+    """처리 끝난 element 와 앞쪽 형제들을 해제 (peak 메모리 = element 하나)"""
+    elem.clear(keep_tail=True)
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
+
+
 def tei_to_html(tei_xml: str) -> str:
     """TEI XML → HTML 변환"""
-    root = etree.fromstring(tei_xml.encode("utf-8"))
-    ns = {"tei": "http://www.tei-c.org/ns/1.0"}
+    title = None
+    abs_list = []
+    body_parts = []
+    section = None   # 현재 위치한 section: "abstract" / "body" / None
+
+    # 한 번의 streaming walk 로 title / abstract / body 를 동시에 분류
+    for event, elem in etree.iterparse(
+        io.BytesIO(tei_xml.encode("utf-8")),
+        events=("start", "end"),
+        tag=(TEI_TITLE, TEI_ABSTRACT, TEI_BODY, TEI_P, TEI_DIV, TEI_BIBL),
+    ):
+        tag = elem.tag
+        if event == "start":
+            if tag == TEI_ABSTRACT:
+                section = "abstract"
+            elif tag == TEI_BODY:
+                section = "body"
+            continue
+
+        if tag == TEI_TITLE:
+            parent = elem.getparent()
+            if title is None and parent is not None and parent.tag == TEI_TITLE_STMT:
+                title = elem.text
+            continue
+        elif tag == TEI_P:
+            if section == "abstract":
+                abs_list.extend(elem.itertext())
+            elif section == "body":
+                # <br> 을 바로 emit (나중에 body 전체를 replace 하지 않음)
+                for t in elem.itertext():
+                    body_parts.append(t.replace("\n", "<br>") if "\n" in t else t)
+        elif tag == TEI_ABSTRACT or tag == TEI_BODY:
+            section = None
+        _release(elem)
 
     # Title
-    title_list = root.xpath("//tei:titleStmt/tei:title/text()", namespaces=ns)
-    title = title_list[0] if title_list else "No Title"
+    title = title or "No Title"
 
-    # Abstract
-    abs_list = root.xpath("//tei:abstract//text()", namespaces=ns)
+    # Abstract (<p> 아래 텍스트만 수집)
     abstract = " ".join(abs_list) if abs_list else "No Abstract"
 
     # Body
-    paras = root.xpath("//tei:body//tei:p//text()", namespaces=ns)
-    body = "\n".join(paras)
-    body_html = body.replace("\n", "<br>")
+    body_html = "<br>".join(body_parts)
 
     # f-string 대신 .format() 사용 (역슬래시 안전)
     html = """
@@ -45,17 +106,60 @@ def tei_to_html(tei_xml: str) -> str:
     return html
 
 
-def process_pdf_to_html(pdf_path: str, output_html: str):
-    client = GrobidClient(config_path="./config.json")
+_CLIENT = None
+_CLIENT_LOCK = threading.Lock()
+
+
+def get_client() -> GrobidClient:
+    """모듈 단위 singleton GrobidClient (PDF 마다 새로 만들지 않음)"""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = GrobidClient(config_path="./config.json")
+        return _CLIENT
+
+
+def pdf_digest(pdf_path: str) -> str:
+    """PDF 내용 기반 cache key"""
+    h = _hash()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def process_fulltext_cached(pdf_path: str) -> str:
+    """GROBID fulltext TEI 를 content hash 로 캐시 (cache_dir/{key}.fulltext.tei.xml)"""
+    key = pdf_digest(pdf_path)
+    cache_path = os.path.join(CACHE_DIR, f"{key}.fulltext.tei.xml")
+
+    if os.path.exists(cache_path):
+        print(f"[INFO] GROBID cache hit: {key}")
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return f.read()
 
     print("[INFO] Processing PDF with GROBID...")
 
-    _, _, tei_xml = client.process_pdf(
+    _, status, tei_xml = get_client().process_pdf(
         "processFulltextDocument",
         pdf_path,
         True, True, True, True, True, True, True
     )
 
+    if status == 200:
+        # 임시 파일에 쓴 뒤 os.replace 로 atomic 저장
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(tei_xml)
+        os.replace(tmp_path, cache_path)
+
+    return tei_xml
+
+
+def process_pdf_to_html(pdf_path: str, output_html: str):
+    tei_xml = process_fulltext_cached(pdf_path)
+
     print("[INFO] Converting TEI XML → HTML...")
     html_out = tei_to_html(tei_xml)
 
@@ -65,7 +169,42 @@ def process_pdf_to_html(pdf_path: str, output_html: str):
     print(f"[DONE] Saved: {output_html}")
 
 
-if __name__ == "__main__":
-    process_pdf_to_html("B.pdf", "B.html")
+def process_pdfs(pdf_paths, out_dir: str, max_workers: int = 8):
+    """여러 PDF 를 thread pool 로 동시에 GROBID 에 제출하고, 끝나는 순서대로 HTML 저장"""
+    os.makedirs(out_dir, exist_ok=True)
+    get_client()
 
+    failed = []
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        futures = {}
+        for pdf_path in pdf_paths:
+            stem = os.path.splitext(os.path.basename(pdf_path))[0]
+            output_html = os.path.join(out_dir, stem + ".html")
+            futures[ex.submit(process_pdf_to_html, pdf_path, output_html)] = pdf_path
 
+        for fut in as_completed(futures):
+            try:
+                fut.result()
+            except Exception as e:
+                print(f"[ERROR] {futures[fut]}: {e}")
+                failed.append(futures[fut])
+
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", nargs="+", default=["B.pdf"])
+    parser.add_argument("--output", default="B.html",
+                        help="output html (single pdf) or output directory (multiple pdfs)")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    if len(args.pdf) == 1 and not os.path.isdir(args.output):
+        process_pdf_to_html(args.pdf[0], args.output)
+    else:
+        process_pdfs(args.pdf, args.output, max_workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,71 @@
 from transformers import AutoTokenizer, AutoModelForSequenceClassification
 import torch
 
-model = AutoModelForSequenceClassification.from_pretrained("saved_model")
+device = "cuda" if torch.cuda.is_available() else "cpu"
+
+# BF16 + fused SDPA attention
+model = AutoModelForSequenceClassification.from_pretrained(
+    "saved_model",
+    torch_dtype=torch.bfloat16 if device == "cuda" else torch.float32,
+    attn_implementation="sdpa",
+).eval().to(device)
+# torch.compile(reduce-overhead) 는 CUDA graph 용 → GPU 에서만
+# (shape 가 바뀌면 다시 compile/capture 하므로 입력은 아래 고정 bucket shape 로만 들어감)
+if device == "cuda":
+    model = torch.compile(model, mode="reduce-overhead", fullgraph=True)
 tokenizer = AutoTokenizer.from_pretrained("saved_model")
 
-def predict(text):
-    enc = tokenizer(text, return_tensors="pt", truncation=True, padding=True)
-    logits = model(**enc).logits
-    pred = torch.argmax(logits, dim=1).item()
-    return "exp" if pred == 1 else "noexp"
+LABELS = ("noexp", "exp")
+
+BATCH_SIZE = 32
+# CUDA 에서는 길이를 이 bucket 중 하나로만 padding (마지막 값 = truncation 길이)
+LENGTH_BUCKETS = (64, 128, 256, 512)
+
+
+def _encode(texts, batch_size=BATCH_SIZE, max_length=LENGTH_BUCKETS[-1]):
+    """texts → model 입력 tensor. 한 번만 tokenize 하고 padding 은 tokenizer.pad 로."""
+    if device != "cuda":
+        # CPU: compile 하지 않으므로 batch 안 최대 길이까지만 padding
+        return tokenizer(texts, return_tensors="pt", truncation=True,
+                         max_length=max_length, padding=True)
 
-print(predict("Pyrolysis of PP at 600°C in a fixed-bed reactor"))
-print(predict("Synthesis of TiO2 nanoparticles by sol-gel"))
+    # CUDA graph 는 shape 마다 capture → row 수는 batch_size (빈 문자열로 채움),
+    # 길이는 batch 최대 길이 이상인 가장 작은 bucket 으로 고정
+    texts = list(texts) + [""] * (batch_size - len(texts))
+    enc = tokenizer(texts, truncation=True, max_length=max_length)
+    longest = max(len(ids) for ids in enc["input_ids"])
+    bucket = next(b for b in LENGTH_BUCKETS if longest <= b)
+    return tokenizer.pad(enc, padding="max_length", max_length=bucket, return_tensors="pt")
+
+
+@torch.inference_mode()
+def predict_batch(texts, batch_size=BATCH_SIZE):
+    """texts 를 batch_size 단위로 묶어서 한 번에 forward → label index 배열"""
+    if not texts:
+        return torch.empty(0, dtype=torch.long).numpy()
+
+    preds = []
+    for i in range(0, len(texts), batch_size):
+        chunk = texts[i:i + batch_size]
+        n = len(chunk)
+        logits = model(**_encode(chunk, batch_size).to(device)).logits
+        preds.append(torch.argmax(logits[:n], dim=1))
+    return torch.cat(preds).cpu().numpy()
+
+def predict(text):
+    pred = predict_batch([text])[0]
+    return LABELS[pred]
 
+# warm-up (CUDA 만): 실제로 쓰는 (BATCH_SIZE, bucket) shape 를 모두 한 번씩 compile
+# 긴 문장을 bucket 길이로 truncation → 정확히 그 bucket shape
+if device == "cuda":
+    with torch.inference_mode():
+        for b in LENGTH_BUCKETS:
+            model(**_encode(["warm " * b], max_length=b).to(device))
 
+texts = [
+    "Pyrolysis of PP at 600°C in a fixed-bed reactor",
+    "Synthesis of TiO2 nanoparticles by sol-gel",
+]
+for pred in predict_batch(texts):
+    print(LABELS[pred])
@@ -3,23 +3,27 @@
 SciBERT EXP/NONEXP 분류기 전체 엔진
 ------------------------------------
 ✓ SciBERT-uncased 사용
-✓ JSONL 데이터 자동 로딩
+✓ JSONL 데이터 자동 로딩 (fast tokenizer 로 일괄 사전 토크나이즈)
 ✓ logging + tqdm
-✓ GPU 자동 사용
+✓ GPU 자동 사용 (BF16/FP16 AMP + gradient accumulation)
 ✓ 학습/검증 정확도 출력
 """
 
 import os
-import json
+import math
 import logging
 from tqdm import tqdm
+import orjson
+import numpy as np
 import torch
 from torch.utils.data import Dataset, DataLoader
 from transformers import (
     AutoTokenizer,
     AutoModelForSequenceClassification,
+    DataCollatorWithPadding,
     get_linear_schedule_with_warmup,
 )
+from transformers.trainer_pt_utils import LengthGroupedSampler
 from sklearn.metrics import accuracy_score
 
 
@@ -39,59 +43,83 @@ logger = logging.getLogger(__name__)
 # -------------------------------------------------------
 class PyroDataset(Dataset):
     def __init__(self, jsonl_file, tokenizer, max_len=256):
-        self.samples = []
-        with open(jsonl_file, "r", encoding="utf-8") as f:
-            for line in f:
-                item = json.loads(line)
-                self.samples.append(item)
+        # bytes 그대로 orjson 으로 파싱 (UTF-8 decode + json.loads 생략)
+        with open(jsonl_file, "rb") as f:
+            self.samples = [orjson.loads(line) for line in f if line.strip()]
 
         self.tokenizer = tokenizer
         self.max_len = max_len
         self.label_map = {"exp": 1, "noexp": 0}
 
+        # 전체 텍스트를 fast tokenizer 로 한 번에 토크나이즈 (샘플별 호출 제거)
+        # padding 은 하지 않고, batch 단위로 collator 에서 dynamic padding
+        texts = [s["text"] for s in self.samples]
+        enc = tokenizer(
+            texts,
+            truncation=True,
+            padding=False,
+            max_length=max_len,
+        )
+        self.input_ids = enc["input_ids"]
+        self.attention_mask = enc["attention_mask"]
+        self.labels = [self.label_map[s["label"]] for s in self.samples]
+        self.lengths = [len(ids) for ids in self.input_ids]
+
     def __len__(self):
         return len(self.samples)
 
     def __getitem__(self, idx):
-        text = self.samples[idx]["text"]
-        label = self.label_map[self.samples[idx]["label"]]
-
-        enc = self.tokenizer(
-            text,
-            truncation=True,
-            padding="max_length",
-            max_length=self.max_len,
-            return_tensors="pt",
-        )
-
+        # plain list 만 반환 (샘플별 (1, L) tensor 생성 없음)
+        # tensor 변환 / padding 은 DataCollatorWithPadding 에서 batch 단위로 한 번에
         return {
-            "input_ids": enc["input_ids"].squeeze(),
-            "attention_mask": enc["attention_mask"].squeeze(),
-            "labels": torch.tensor(label, dtype=torch.long),
+            "input_ids": self.input_ids[idx],
+            "attention_mask": self.attention_mask[idx],
+            "labels": self.labels[idx],
         }
 
 
 # -------------------------------------------------------
 # 2) Training Function
 # -------------------------------------------------------
-def train_one_epoch(model, loader, optimizer, scheduler, device):
+def train_one_epoch(model, loader, optimizer, scheduler, device,
+                    amp_dtype=None, scaler=None, accum_steps=1):
+    """
+    amp_dtype : torch.bfloat16 / torch.float16 이면 autocast, None 이면 FP32
+    scaler    : FP16 일 때만 enabled 된 GradScaler
+    accum_steps : gradient accumulation (logical batch = batch_size * accum_steps)
+    """
     model.train()
     total_loss = 0
+    use_amp = amp_dtype is not None
+    if scaler is None:
+        scaler = torch.amp.GradScaler(enabled=False)
 
-    pbar = tqdm(loader, desc="Training", ncols=120)
-    for batch in pbar:
-        batch = {k: v.to(device) for k, v in batch.items()}
-
-        outputs = model(**batch)
-        loss = outputs.loss
+    optimizer.zero_grad(set_to_none=True)
 
-        optimizer.zero_grad()
-        loss.backward()
-        optimizer.step()
-        scheduler.step()
-
-        total_loss += loss.item()
-        pbar.set_postfix({"loss": f"{loss.item():.4f}"})
+    pbar = tqdm(loader, desc="Training", ncols=120)
+    for step, batch in enumerate(pbar, 1):
+        # pinned memory → 비동기 H2D 복사 (이전 step 의 GPU 연산과 overlap)
+        input_ids = batch["input_ids"].to(device, non_blocking=True)
+        attention_mask = batch["attention_mask"].to(device, non_blocking=True)
+        batch_labels = batch["labels"].to(device, non_blocking=True)
+
+        with torch.autocast(device_type=device, dtype=amp_dtype, enabled=use_amp):
+            outputs = model(
+                input_ids=input_ids, attention_mask=attention_mask, labels=batch_labels
+            )
+            loss = outputs.loss / accum_steps
+
+        scaler.scale(loss).backward()
+
+        if step % accum_steps == 0 or step == len(loader):
+            scaler.step(optimizer)
+            scaler.update()
+            optimizer.zero_grad(set_to_none=True)
+            scheduler.step()
+
+        step_loss = loss.item() * accum_steps
+        total_loss += step_loss
+        pbar.set_postfix({"loss": f"{step_loss:.4f}"})
 
     return total_loss / len(loader)
 
@@ -100,18 +128,31 @@ def train_one_epoch(model, loader, optimizer, scheduler, device):
 # 3) Evaluation
 # -------------------------------------------------------
 @torch.no_grad()
-def evaluate(model, loader, device):
+def evaluate(model, loader, device, amp_dtype=None):
     model.eval()
-    preds, labels = [], []
+
+    # 결과 버퍼를 미리 할당 (batch 마다 list 생성/확장 없음)
+    n = len(loader.dataset)
+    preds = torch.empty(n, dtype=torch.long, device=device)
+    labels = np.empty(n, dtype=np.int64)
+    i = 0
 
     for batch in tqdm(loader, desc="Evaluating", ncols=120):
-        labels.extend(batch["labels"].tolist())
-        batch = {k: v.to(device) for k, v in batch.items()}
+        input_ids = batch["input_ids"].to(device, non_blocking=True)
+        attention_mask = batch["attention_mask"].to(device, non_blocking=True)
 
-        outputs = model(**batch)
+        with torch.autocast(device_type=device, dtype=amp_dtype, enabled=amp_dtype is not None):
+            outputs = model(input_ids=input_ids, attention_mask=attention_mask)
         logits = outputs.logits
-        preds.extend(torch.argmax(logits, dim=1).cpu().tolist())
 
+        # GPU 작업을 먼저 큐에 넣은 뒤 CPU 쪽 label 처리
+        bs = input_ids.size(0)
+        labels[i:i + bs] = batch["labels"].numpy()
+        preds[i:i + bs] = torch.argmax(logits, dim=1)
+        i += bs
+
+    # device → host 복사는 마지막에 한 번만
+    preds = preds.cpu().numpy()
     acc = accuracy_score(labels, preds)
     return acc
 
@@ -128,14 +169,21 @@ def main():
 
     # SciBERT-uncased (추천)
     model_name = "allenai/scibert_scivocab_uncased"
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer = AutoTokenizer.from_pretrained(model_name, use_fast=True)
 
     # Dataset
     train_ds = PyroDataset(train_path, tokenizer)
     valid_ds = PyroDataset(valid_path, tokenizer)
 
-    train_loader = DataLoader(train_ds, batch_size=8, shuffle=True)
-    valid_loader = DataLoader(valid_ds, batch_size=8)
+    # Dynamic padding (batch 내 최대 길이, tensor core 용 8의 배수) + 길이별 bucketing
+    collator = DataCollatorWithPadding(tokenizer, pad_to_multiple_of=8)
+    train_sampler = LengthGroupedSampler(batch_size=8, lengths=train_ds.lengths)
+
+    loader_kwargs = dict(
+        collate_fn=collator, num_workers=4, persistent_workers=True, pin_memory=True
+    )
+    train_loader = DataLoader(train_ds, batch_size=8, sampler=train_sampler, **loader_kwargs)
+    valid_loader = DataLoader(valid_ds, batch_size=8, **loader_kwargs)
 
     # Model
     model = AutoModelForSequenceClassification.from_pretrained(
@@ -146,9 +194,19 @@ def main():
     # Optimizer
     optimizer = torch.optim.AdamW(model.parameters(), lr=2e-5)
 
-    # Scheduler
+    # Mixed precision: Ampere+ 는 BF16, 그 외 GPU 는 FP16 + GradScaler
+    amp_dtype = None
+    if device == "cuda":
+        amp_dtype = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+    scaler = torch.amp.GradScaler("cuda", enabled=amp_dtype == torch.float16)
+    logger.info(f"AMP dtype: {amp_dtype}")
+
+    # Gradient accumulation (logical batch = 8 * 4 = 32)
+    accum_steps = 4
+
+    # Scheduler (optimizer step 기준)
     epochs = 4
-    total_steps = len(train_loader) * epochs
+    total_steps = math.ceil(len(train_loader) / accum_steps) * epochs
     scheduler = get_linear_schedule_with_warmup(
         optimizer, num_warmup_steps=int(0.1 * total_steps), num_training_steps=total_steps
     )
@@ -157,8 +215,11 @@ def main():
     for epoch in range(1, epochs + 1):
         logger.info(f"Epoch {epoch}/{epochs}")
 
-        train_loss = train_one_epoch(model, train_loader, optimizer, scheduler, device)
-        val_acc = evaluate(model, valid_loader, device)
+        train_loss = train_one_epoch(
+            model, train_loader, optimizer, scheduler, device,
+            amp_dtype=amp_dtype, scaler=scaler, accum_steps=accum_steps,
+        )
+        val_acc = evaluate(model, valid_loader, device, amp_dtype=amp_dtype)
 
         logger.info(f"[Epoch {epoch}] Train Loss: {train_loss:.4f}, Valid Acc: {val_acc:.4f}")
         print(f"📢 Epoch {epoch}: Train Loss={train_loss:.4f}, Valid Acc={val_acc:.4f}")
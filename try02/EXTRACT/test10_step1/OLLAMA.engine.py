@@ -1,32 +1,62 @@
 # step1_engine.py
-import subprocess
 import json
 import argparse
-from pathlib import Path
+import mmap
+import os
 
-MODEL = "qwen3:30b-a3b-instruct-2507-q4_K_M"
-
-
-def run_ollama(prompt_text: str):
-    """Run Ollama model and return output string."""
-    cmd = ["ollama", "run", MODEL]
-    process = subprocess.Popen(
-        cmd,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
-    out, err = process.communicate(input=prompt_text)
+import requests
 
-    if err and err.strip():
-        print("[Error]", err)
+# orjson (Rust parser) when available; its JSONDecodeError subclasses json's
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
-    return out
+MODEL = "qwen3:30b-a3b-instruct-2507-q4_K_M"
+OLLAMA_URL = "http://localhost:11434/api/generate"
+KEEP_ALIVE = "1h"   # keep the model resident between calls
+
+# Reused HTTP keep-alive session (no `ollama run` process per call)
+_SESSION = requests.Session()
+
+
+def run_ollama(prompt_text: str, out_path: str):
+    """Run Ollama model and return output string.
+    Output is written to out_path as it is generated."""
+    # Stream tokens straight into out_path while the model is still generating
+    pieces = []
+    with _SESSION.post(
+        OLLAMA_URL,
+        json={
+            "model": MODEL,
+            "prompt": prompt_text,
+            "stream": True,
+            "keep_alive": KEEP_ALIVE,
+        },
+        stream=True,
+    ) as resp, open(out_path, "w", encoding="utf-8") as f:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            msg = json_loads(line)
+            piece = msg.get("response", "")
+            if piece:
+                f.write(piece)
+                pieces.append(piece)
+            if msg.get("done"):
+                break
+    return "".join(pieces)
 
 
 def load_text(path):
-    return Path(path).read_text(encoding="utf-8")
+    """Decode the file straight from a read-only mmap (no intermediate bytes copy)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, "utf-8")
 
 
 def main():
@@ -46,15 +76,12 @@ def main():
     print(" [STEP 1] Extract SINGLE Experiment + Outcome Groups")
     print("==============================\n")
 
-    step1_output = run_ollama(step1_prompt)
+    step1_output = run_ollama(step1_prompt, "step1_output.json")
     print(step1_output)
 
-    # Save raw output
-    Path("step1_output.json").write_text(step1_output, encoding="utf-8")
-
     # Validate JSON
     try:
-        parsed = json.loads(step1_output)
+        parsed = json_loads(step1_output)
         print("\n✅ JSON validated successfully.")
     except json.JSONDecodeError:
         print("\n❌ ERROR: Step1 output is not valid JSON.")
@@ -6,37 +6,65 @@ NUEXTRACT Step1 Engine
 - Output: step1_output.json (strict JSON)
 """
 
-import subprocess
 import json
 import argparse
-from pathlib import Path
+import mmap
+import os
 
+import requests
 
-MODEL = "nuextract:latest"   # Ollama model for information extraction
-
-
-def run_ollama(prompt_text: str):
-    """Run the nuextract model and return output string."""
-    cmd = ["ollama", "run", MODEL]
-    process = subprocess.Popen(
-        cmd,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
+# orjson (Rust parser) when available; its JSONDecodeError subclasses json's
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
-    out, err = process.communicate(input=prompt_text)
 
-    if err and err.strip():
-        print("[Error from model]", err)
-
-    return out
+MODEL = "nuextract:latest"   # Ollama model for information extraction
+OLLAMA_URL = "http://localhost:11434/api/generate"
+KEEP_ALIVE = "1h"   # keep the model resident between calls
+
+# Reused HTTP keep-alive session (no `ollama run` process per call)
+_SESSION = requests.Session()
+
+
+def run_ollama(prompt_text: str, out_path: str):
+    """Run the nuextract model and return output string.
+    Output is written to out_path as it is generated."""
+    # Stream tokens straight into out_path while the model is still generating
+    pieces = []
+    with _SESSION.post(
+        OLLAMA_URL,
+        json={
+            "model": MODEL,
+            "prompt": prompt_text,
+            "stream": True,
+            "keep_alive": KEEP_ALIVE,
+        },
+        stream=True,
+    ) as resp, open(out_path, "w", encoding="utf-8") as f:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            msg = json_loads(line)
+            piece = msg.get("response", "")
+            if piece:
+                f.write(piece)
+                pieces.append(piece)
+            if msg.get("done"):
+                break
+    return "".join(pieces)
 
 
 def load_text(path: str) -> str:
-    """Load text file content."""
-    return Path(path).read_text(encoding="utf-8")
+    """Decode the file straight from a read-only mmap (no intermediate bytes copy)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, "utf-8")
 
 
 def main():
@@ -57,17 +85,14 @@ def main():
     print("==============================\n")
 
     # Run model
-    step1_output = run_ollama(step1_prompt)
+    step1_output = run_ollama(step1_prompt, "step1_output.json")
 
     print(step1_output)
 
-    # Save raw model output
-    Path("step1_output.json").write_text(step1_output, encoding="utf-8")
-
     print("\n>>> Validating JSON...\n")
 
     try:
-        parsed = json.loads(step1_output)
+        parsed = json_loads(step1_output)
         print("✔ JSON structure is valid.")
     except json.JSONDecodeError as e:
         print("❌ ERROR: Output is not valid JSON.")
@@ -6,37 +6,87 @@ QWEN2.5 Step1 Extraction Engine
 - Safe JSON validation + auto-repair
 """
 
-import subprocess
-import json
 import argparse
+import mmap
+import os
 from pathlib import Path
 import re
 
+import ijson
+import orjson
+import requests
+
 
 MODEL = "qwen2.5:14b-instruct"
+OLLAMA_URL = "http://localhost:11434/api/generate"
+KEEP_ALIVE = "1h"   # keep the model resident between calls
+
+# Reused HTTP keep-alive session (no `ollama run` process per call)
+_SESSION = requests.Session()
+
+# Compiled once: markdown code fences around the JSON
+_FENCE = re.compile(r"```(?:json)?")
 
 
 # ------------------------------------------------------
 # Ollama run
 # ------------------------------------------------------
-def run_ollama(prompt_text: str):
-    """Run the model via subprocess and return output string."""
-    cmd = ["ollama", "run", MODEL]
-
-    process = subprocess.Popen(
-        cmd,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
-
-    out, err = process.communicate(input=prompt_text)
-
-    if err and err.strip():
-        print("[Model Error]", err)
+def run_ollama_stream(prompt_text: str, raw_path: str):
+    """
+    Stream the model output token-by-token.
+    - Each chunk is written to raw_path as soon as it arrives.
+    - Chunks are fed to an incremental JSON parser (ijson) at the same time.
+    Returns (raw_output, parsed) where parsed is None if the stream
+    was not a single valid JSON document.
+    """
+    pieces = []
+    items = ijson.sendable_list()
+    json_coro = ijson.items_coro(items, "", use_float=True)
+    json_ok = True
+
+    with _SESSION.post(
+        OLLAMA_URL,
+        json={
+            "model": MODEL,
+            "prompt": prompt_text,
+            "stream": True,
+            "keep_alive": KEEP_ALIVE,
+        },
+        stream=True,
+    ) as resp, open(raw_path, "w", encoding="utf-8") as raw_f:
+        resp.raise_for_status()
+
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            msg = orjson.loads(line)
+            chunk = msg.get("response", "")
+            if chunk:
+                pieces.append(chunk)
+                raw_f.write(chunk)
+                print(chunk, end="", flush=True)
+
+                if json_ok:
+                    try:
+                        json_coro.send(chunk.encode("utf-8"))
+                    except ijson.JSONError:
+                        # e.g. markdown fences -> leave it to try_parse_json
+                        json_ok = False
+            if msg.get("done"):
+                break
+
+    print()
+    raw_output = "".join(pieces)
+
+    if json_ok:
+        try:
+            json_coro.close()
+        except ijson.JSONError:
+            json_ok = False
 
-    return out
+    if json_ok and len(items) == 1:
+        return raw_output, items[0]
+    return raw_output, None
 
 
 # ------------------------------------------------------
@@ -45,15 +95,15 @@ def run_ollama(prompt_text: str):
 def try_parse_json(output: str):
     """Try multiple strategies to load JSON."""
     try:
-        return json.loads(output)
+        return orjson.loads(output)
     except Exception:
         pass
 
     # Remove Markdown fences
-    cleaned = re.sub(r"```json|```", "", output).strip()
+    cleaned = _FENCE.sub("", output).strip()
 
     try:
-        return json.loads(cleaned)
+        return orjson.loads(cleaned)
     except Exception:
         pass
 
@@ -65,7 +115,7 @@ def try_parse_json(output: str):
     last_brace = cleaned.rfind("}")
     if last_brace != -1:
         try:
-            return json.loads(cleaned[:last_brace + 1])
+            return orjson.loads(cleaned[:last_brace + 1])
         except Exception:
             pass
 
@@ -76,7 +126,12 @@ def try_parse_json(output: str):
 # File loader
 # ------------------------------------------------------
 def load_text(path: str) -> str:
-    return Path(path).read_text(encoding="utf-8")
+    """Decode the file straight from a read-only mmap (no intermediate bytes copy)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, "utf-8")
 
 
 # ------------------------------------------------------
@@ -99,29 +154,24 @@ def main():
     print("   [STEP 1] QWEN 2.5 – STRICT EXTRACTION")
     print("=============================================\n")
 
-    # Run model
-    raw_output = run_ollama(final_prompt)
-
+    # Run model (raw output is streamed to step1_output_raw.txt as it arrives)
     print("\n--- RAW MODEL OUTPUT ---\n")
-    print(raw_output)
-
-    # Save raw output
-    Path("step1_output_raw.txt").write_text(raw_output, encoding="utf-8")
+    raw_output, parsed = run_ollama_stream(final_prompt, "step1_output_raw.txt")
 
-    print("\n>>> Validating and repairing JSON...\n")
+    if parsed is None:
+        print("\n>>> Validating and repairing JSON...\n")
 
-    try:
-        parsed = try_parse_json(raw_output)
-    except Exception as e:
-        print("❌ JSON parsing failed!")
-        print("   Error:", e)
-        print("   Check step1_output_raw.txt manually.")
-        return
+        try:
+            parsed = try_parse_json(raw_output)
+        except Exception as e:
+            print("❌ JSON parsing failed!")
+            print("   Error:", e)
+            print("   Check step1_output_raw.txt manually.")
+            return
 
     # Save valid JSON
-    Path("step1_output.json").write_text(
-        json.dumps(parsed, indent=2, ensure_ascii=False),
-        encoding="utf-8"
+    Path("step1_output.json").write_bytes(
+        orjson.dumps(parsed, option=orjson.OPT_INDENT_2)
     )
 
     print("✔ JSON successfully parsed and saved to step1_output.json\n")
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Step1 Ensemble Engine
+- Runs Qwen2.5-14b-instruct and nuextract on the same prompt concurrently
+- Both requests go to the Ollama daemon at the same time (asyncio.gather)
+- Output: step1_output_raw.<tag>.txt / step1_output.<tag>.json per model
+"""
+
+import argparse
+import asyncio
+import mmap
+import os
+from pathlib import Path
+import re
+
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+
+MODELS = {
+    "qwen": "qwen2.5:14b-instruct",
+    "nuextract": "nuextract:latest",
+}
+OLLAMA_URL = "http://localhost:11434/api/generate"
+KEEP_ALIVE = "1h"   # keep the models resident between calls
+
+_FENCE = re.compile(r"```(?:json)?")
+_JSON_BODY = re.compile(r"\{[\s\S]*\}")
+
+# Reused HTTP keep-alive session (no `ollama run` process per call)
+_SESSION = requests.Session()
+# one pooled connection per model request running at the same time
+_SESSION.mount("http://", HTTPAdapter(pool_maxsize=len(MODELS)))
+
+
+def _post_generate(model: str, prompt_text: str) -> str:
+    resp = _SESSION.post(
+        OLLAMA_URL,
+        json={
+            "model": model,
+            "prompt": prompt_text,
+            "stream": False,
+            "keep_alive": KEEP_ALIVE,
+        },
+    )
+    resp.raise_for_status()
+    return resp.json()["response"]
+
+
+async def run_ollama(model: str, prompt_text: str) -> str:
+    """Run one model without blocking the event loop."""
+    return await asyncio.to_thread(_post_generate, model, prompt_text)
+
+
+def load_text(path: str) -> str:
+    """Decode the file straight from a read-only mmap (no intermediate bytes copy)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, "utf-8")
+
+
+def extract_json(raw: str):
+    """Strip code fences, then fall back to the outermost {...} block."""
+    raw = _FENCE.sub("", raw).strip()
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        pass
+
+    match = _JSON_BODY.search(raw)
+    if match:
+        try:
+            return orjson.loads(match.group(0))
+        except orjson.JSONDecodeError:
+            pass
+
+    return None  # Failed
+
+
+async def run_all(prompt: str):
+    tags = list(MODELS)
+    outputs = await asyncio.gather(*(run_ollama(MODELS[tag], prompt) for tag in tags))
+    return dict(zip(tags, outputs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Step1 Ensemble Engine (qwen + nuextract)")
+    parser.add_argument("--input", required=True, help="Fulltext markdown or txt")
+    parser.add_argument("--prompt1", required=True, help="Prompt1 template")
+    args = parser.parse_args()
+
+    paper_text = load_text(args.input)
+    prompt = load_text(args.prompt1).replace("{{PAPER_TEXT}}", paper_text)
+
+    print("\n=============================================")
+    print("   [STEP 1] ENSEMBLE — " + " + ".join(MODELS.values()))
+    print("=============================================\n")
+
+    outputs = asyncio.run(run_all(prompt))
+
+    for tag, raw_output in outputs.items():
+        raw_path = f"step1_output_raw.{tag}.txt"
+        Path(raw_path).write_bytes(raw_output.encode("utf-8"))
+
+        parsed = extract_json(raw_output)
+        if parsed is None:
+            print(f"❌ [{tag}] JSON parsing failed! Check {raw_path} manually.")
+            continue
+
+        out_path = f"step1_output.{tag}.json"
+        Path(out_path).write_bytes(orjson.dumps(parsed, option=orjson.OPT_INDENT_2))
+        print(f"✔ [{tag}] JSON saved to {out_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,33 +6,56 @@ QWEN2.5-14B Step1 Extraction Engine
 - Auto-recovers malformed JSON
 """
 
-import subprocess
-import json
 import argparse
+import mmap
+import os
 from pathlib import Path
 import re
 
+import orjson
+import requests
+
 MODEL = "qwen2.5:14b-instruct"
+OLLAMA_URL = "http://localhost:11434/api/generate"
+KEEP_ALIVE = "1h"   # keep the model resident between calls
 
+# Reused HTTP keep-alive session (no `ollama run` process per call)
+_SESSION = requests.Session()
 
-def run_ollama(prompt_text: str):
-    """Run the Qwen model through Ollama and return raw text output."""
-    cmd = ["ollama", "run", MODEL]
-    process = subprocess.Popen(
-        cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE, text=True
-    )
+PLACEHOLDER = "{{PAPER_TEXT}}"
 
-    out, err = process.communicate(input=prompt_text)
+# Compiled once: markdown code fences / outermost {...} block
+_FENCE = re.compile(r"```(?:json)?")
+_JSON_BODY = re.compile(r"\{[\s\S]*\}")
 
-    if err and err.strip():
-        print("[Model STDERR]", err)
 
-    return out
+def run_qwen(prompt_text: str):
+    """
+    Run the Qwen model through Ollama (/api/generate, chat template applied)
+    and return raw text output.
+    The template part before the paper is identical for every paper, so Ollama
+    reuses its KV cache automatically while the model stays loaded (keep_alive).
+    """
+    resp = _SESSION.post(
+        OLLAMA_URL,
+        json={
+            "model": MODEL,
+            "prompt": prompt_text,
+            "stream": False,
+            "keep_alive": KEEP_ALIVE,
+        },
+    )
+    resp.raise_for_status()
+    return resp.json()["response"]
 
 
 def load_text(path: str) -> str:
-    return Path(path).read_text(encoding="utf-8")
+    """Decode the file straight from a read-only mmap (no intermediate bytes copy)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, "utf-8")
 
 
 def extract_json(raw: str):
@@ -40,21 +63,20 @@ def extract_json(raw: str):
     Attempt to isolate and repair JSON from raw output.
     """
     # 1) Remove code fences if model added them
-    raw = raw.strip()
-    raw = raw.replace("```json", "").replace("```", "")
+    raw = _FENCE.sub("", raw).strip()
 
     # 2) Attempt direct parsing
     try:
-        return json.loads(raw)
+        return orjson.loads(raw)
     except:
         pass
 
     # 3) Try to extract JSON substring using regex
-    match = re.search(r"\{[\s\S]*\}", raw)
+    match = _JSON_BODY.search(raw)
     if match:
         candidate = match.group(0)
         try:
-            return json.loads(candidate)
+            return orjson.loads(candidate)
         except:
             pass
 
@@ -63,44 +85,50 @@ def extract_json(raw: str):
 
 def main():
     parser = argparse.ArgumentParser(description="QWEN2.5 Step1 Engine")
-    parser.add_argument("--input", required=True, help="Fulltext markdown or txt")
+    parser.add_argument("--input", required=True, nargs="+", help="Fulltext markdown or txt (one or more papers)")
     parser.add_argument("--prompt1", required=True, help="Prompt1 template")
     args = parser.parse_args()
 
-    # Load
-    paper_text = load_text(args.input)
     prompt1 = load_text(args.prompt1)
 
-    # Insert full text
-    prompt = prompt1.replace("{{PAPER_TEXT}}", paper_text)
+    for input_path in args.input:
+        # Keep the original file names for a single paper
+        tag = "" if len(args.input) == 1 else Path(input_path).stem + "."
+        raw_path = f"{tag}step1_output_raw.txt"
+        out_path = f"{tag}step1_output.json"
 
-    print("\n=============================================")
-    print("   [STEP 1] QWEN2.5–14B STRICT EXTRACTION")
-    print("=============================================\n")
+        # Load
+        paper_text = load_text(input_path)
 
-    # Run model
-    raw_output = run_ollama(prompt)
+        print("\n=============================================")
+        print("   [STEP 1] QWEN2.5–14B STRICT EXTRACTION")
+        print(f"   {input_path}")
+        print("=============================================\n")
 
-    Path("step1_output_raw.txt").write_text(raw_output, encoding="utf-8")
-    print("--- RAW MODEL OUTPUT SAVED TO step1_output_raw.txt ---\n")
+        # Insert full text
+        prompt = prompt1.replace(PLACEHOLDER, paper_text)
 
-    # Try repair
-    print(">>> Validating and repairing JSON...\n")
-    parsed = extract_json(raw_output)
+        # Run model
+        raw_output = run_qwen(prompt)
 
-    if parsed is None:
-        print("❌ JSON parsing failed!")
-        print("   Check step1_output_raw.txt manually.")
-        return
+        Path(raw_path).write_bytes(raw_output.encode("utf-8"))
+        print(f"--- RAW MODEL OUTPUT SAVED TO {raw_path} ---\n")
 
-    # Save final
-    Path("step1_output.json").write_text(
-        json.dumps(parsed, indent=2, ensure_ascii=False),
-        encoding="utf-8"
-    )
+        # Try repair
+        print(">>> Validating and repairing JSON...\n")
+        parsed = extract_json(raw_output)
+
+        if parsed is None:
+            print("❌ JSON parsing failed!")
+            print(f"   Check {raw_path} manually.")
+            continue
 
-    print("✔ JSON successfully extracted and saved to step1_output.json")
+        # Save final
+        Path(out_path).write_bytes(
+            orjson.dumps(parsed, option=orjson.OPT_INDENT_2)
+        )
 
+        print(f"✔ JSON successfully extracted and saved to {out_path}")
 
 if __name__ == "__main__":
     main()
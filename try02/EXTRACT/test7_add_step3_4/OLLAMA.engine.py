@@ -1,26 +1,62 @@
-import subprocess
 import json
 import argparse
+import hashlib
+import mmap
+import os
+import threading
 from pathlib import Path
 import re
 
-MODEL = "qwen3:30b-a3b-instruct-2507-q4_K_M"
+import requests
 
+# orjson (Rust parser) when available; its JSONDecodeError subclasses json's
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
-def run_ollama(prompt_text: str):
-    cmd = ["ollama", "run", MODEL]
-    process = subprocess.Popen(
-        cmd,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
+MODEL = "qwen3:30b-a3b-instruct-2507-q4_K_M"
+OLLAMA_URL = "http://localhost:11434/api/generate"
+KEEP_ALIVE = "1h"   # keep the model resident between calls
+
+# Reused HTTP keep-alive session (no `ollama run` process per call)
+_SESSION = requests.Session()
+
+# On-disk response cache keyed by sha256(model + prompt)
+CACHE_DIR = Path("cache")
+
+
+def _generate(prompt_text: str):
+    """Run Ollama model and return output string."""
+    resp = _SESSION.post(
+        OLLAMA_URL,
+        json={
+            "model": MODEL,
+            "prompt": prompt_text,
+            "stream": False,
+            "keep_alive": KEEP_ALIVE,
+        },
     )
-    out, err = process.communicate(input=prompt_text)
+    resp.raise_for_status()
+    return resp.json()["response"]
 
-    if err and err.strip():
-        print("[Error]", err)
 
+def run_ollama(prompt_text: str):
+    """Same as _generate, but identical (model, prompt) pairs are served from cache/."""
+    key = hashlib.sha256(f"{MODEL}\0{prompt_text}".encode("utf-8")).hexdigest()
+    cache_path = CACHE_DIR / f"{key}.txt"
+    if cache_path.exists():
+        print(f"[cache hit] {key[:12]}")
+        return cache_path.read_text(encoding="utf-8")
+
+    out = _generate(prompt_text)
+
+    # write to a temp file first, then atomically move into place
+    CACHE_DIR.mkdir(exist_ok=True)
+    tmp_path = cache_path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(out.encode("utf-8"))
+    os.replace(tmp_path, cache_path)
     return out
 
 
@@ -29,30 +65,51 @@ def clean_json_output(raw_text):
     Extract first valid JSON block from model output.
     Removes extra text before/after JSON.
     """
-    # Find first '{' and last '}'
-    match = re.search(r"\{.*\}", raw_text, re.DOTALL)
-    if match:
-        return match.group(0)
+    # Find first '{' and last '}' (two linear scans, no regex backtracking)
+    start = raw_text.find("{")
+    end = raw_text.rfind("}")
+    if start != -1 and end > start:
+        return raw_text[start:end + 1]
     return raw_text  # fallback
 
 
 def load_text(path):
-    return Path(path).read_text(encoding="utf-8")
+    """Decode the file straight from a read-only mmap (no intermediate bytes copy)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, "utf-8")
+
+
+_PLACEHOLDER = re.compile(r"\{\{(\w+)\}\}")
+
+
+def fill_template(template, values):
+    """Substitute {{NAME}} placeholders in one pass.
+    Split once on the placeholders, then a single join (no chained .replace copies).
+    Unknown placeholders are left as-is."""
+    parts = _PLACEHOLDER.split(template)
+    parts[1::2] = [values.get(name, "{{" + name + "}}") for name in parts[1::2]]
+    return "".join(parts)
 
 
 def save_json(path, content):
-    Path(path).write_text(content, encoding="utf-8")
+    Path(path).write_bytes(content.encode("utf-8"))
 
 
 def try_parse_json(text, step_name):
+    """Validate text as JSON -> (parsed, text).
+    parsed is None on failure; text is returned as-is so it can be spliced
+    into the next prompt without a dumps round-trip."""
     try:
-        return json.loads(text)
+        return json_loads(text), text
     except json.JSONDecodeError:
         print(f"\n❌ JSON ERROR in {step_name}. Output is not valid JSON.")
         print("--------------------------------------------------------")
         print(text)
         print("--------------------------------------------------------")
-        return None
+        return None, text
 
 
 def main():
@@ -80,7 +137,7 @@ def main():
     step1_clean = clean_json_output(step1_raw)
     save_json("step1_output.json", step1_clean)
 
-    step1_json = try_parse_json(step1_clean, "STEP1")
+    step1_json, step1_clean = try_parse_json(step1_clean, "STEP1")
     if step1_json is None:
         return
 
@@ -92,10 +149,11 @@ def main():
     print("==============================\n")
 
     prompt2 = load_text(args.step2)
-    step2_prompt = (
-        prompt2.replace("{{PAPER_TEXT}}", paper_text)
-              .replace("{{EXTRACTION_JSON}}", json.dumps(step1_json, indent=2))
-    )
+    # stepN_clean already validated as JSON -> splice it as-is (no dumps round-trip)
+    step2_prompt = fill_template(prompt2, {
+        "PAPER_TEXT": paper_text,
+        "EXTRACTION_JSON": step1_clean.strip(),
+    })
 
     step2_raw = run_ollama(step2_prompt)
     print(step2_raw)
@@ -103,7 +161,7 @@ def main():
     step2_clean = clean_json_output(step2_raw)
     save_json("step2_output.json", step2_clean)
 
-    step2_json = try_parse_json(step2_clean, "STEP2")
+    step2_json, step2_clean = try_parse_json(step2_clean, "STEP2")
     if step2_json is None:
         return
 
@@ -115,10 +173,10 @@ def main():
     print("==============================\n")
 
     prompt3 = load_text(args.step3)
-    step3_prompt = (
-        prompt3.replace("{{PAPER_TEXT}}", paper_text)
-               .replace("{{EXTRACTION_JSON}}", json.dumps(step2_json, indent=2))
-    )
+    step3_prompt = fill_template(prompt3, {
+        "PAPER_TEXT": paper_text,
+        "EXTRACTION_JSON": step2_clean.strip(),
+    })
 
     step3_raw = run_ollama(step3_prompt)
     print(step3_raw)
@@ -126,7 +184,7 @@ def main():
     step3_clean = clean_json_output(step3_raw)
     save_json("step3_output.json", step3_clean)
 
-    step3_json = try_parse_json(step3_clean, "STEP3")
+    step3_json, step3_clean = try_parse_json(step3_clean, "STEP3")
     if step3_json is None:
         return
 
@@ -138,10 +196,10 @@ def main():
     print("==============================\n")
 
     prompt4 = load_text(args.step4)
-    step4_prompt = (
-        prompt4.replace("{{PAPER_TEXT}}", paper_text)
-               .replace("{{STEP3_JSON}}", json.dumps(step3_json, indent=2))
-    )
+    step4_prompt = fill_template(prompt4, {
+        "PAPER_TEXT": paper_text,
+        "STEP3_JSON": step3_clean.strip(),
+    })
 
     step4_raw = run_ollama(step4_prompt)
     print(step4_raw)
@@ -149,7 +207,7 @@ def main():
     step4_clean = clean_json_output(step4_raw)
     save_json("step4_output.json", step4_clean)
 
-    step4_json = try_parse_json(step4_clean, "STEP4")
+    step4_json, step4_clean = try_parse_json(step4_clean, "STEP4")
     if step4_json is None:
         return
 
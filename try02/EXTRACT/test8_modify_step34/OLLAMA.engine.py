@@ -1,38 +1,105 @@
-import subprocess
 import json
 import argparse
+import hashlib
+import mmap
+import os
+import threading
 from pathlib import Path
 
+import requests
+
+# orjson (Rust parser) when available; its JSONDecodeError subclasses json's
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 
 MODEL = "qwen3:30b-a3b-instruct-2507-q4_K_M"
+OLLAMA_URL = "http://localhost:11434/api/generate"
+KEEP_ALIVE = -1   # never unload, so the paper_text prefix KV cache survives between steps
+
+# Reused HTTP keep-alive session (no `ollama run` process per call)
+_SESSION = requests.Session()
+
+# On-disk response cache keyed by sha256(model + prompt)
+CACHE_DIR = Path("cache")
+
+
+def _generate(prompt_text: str, out_path: str):
+    """Run Ollama model and return output string.
+    Output is written to out_path as it is generated."""
+    # Stream tokens straight into out_path while the model is still generating
+    pieces = []
+    with _SESSION.post(
+        OLLAMA_URL,
+        json={
+            "model": MODEL,
+            "prompt": prompt_text,
+            "stream": True,
+            "keep_alive": KEEP_ALIVE,
+        },
+        stream=True,
+    ) as resp, open(out_path, "w", encoding="utf-8") as f:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            msg = json_loads(line)
+            piece = msg.get("response", "")
+            if piece:
+                f.write(piece)
+                pieces.append(piece)
+            if msg.get("done"):
+                break
+    return "".join(pieces)
+
+
+def run_ollama(prompt_text: str, out_path: str):
+    """Same as _generate, but identical (model, prompt) pairs are served from cache/."""
+    key = hashlib.sha256(f"{MODEL}\0{prompt_text}".encode("utf-8")).hexdigest()
+    cache_path = CACHE_DIR / f"{key}.txt"
+    if cache_path.exists():
+        print(f"[cache hit] {key[:12]}")
+        out = cache_path.read_text(encoding="utf-8")
+        Path(out_path).write_bytes(out.encode("utf-8"))
+        return out
+
+    out = _generate(prompt_text, out_path)
+
+    # write to a temp file first, then atomically move into place
+    CACHE_DIR.mkdir(exist_ok=True)
+    tmp_path = cache_path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(out.encode("utf-8"))
+    os.replace(tmp_path, cache_path)
+    return out
 
 
-def run_ollama(prompt_text: str):
-    """Run Ollama model and return output string."""
-    cmd = ["ollama", "run", MODEL]
-    process = subprocess.Popen(
-        cmd,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
-    out, err = process.communicate(input=prompt_text)
+def load_text(path):
+    """Decode the file straight from a read-only mmap (no intermediate bytes copy)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, "utf-8")
 
-    if err and err.strip():
-        print("[Error]", err)
 
-    return out
+def paper_prefix(paper_text):
+    """Shared leading block of every step prompt (built once per run)."""
+    return "".join(("BEGIN PAPER_TEXT:\n", paper_text, "\nEND PAPER_TEXT\n\n---INSTRUCTION---\n"))
 
 
-def load_text(path):
-    return Path(path).read_text(encoding="utf-8")
+def build_prompt(prefix, instructions):
+    """Put the paper prefix first so every step shares the same prompt prefix
+    (Ollama reuses the KV cache for a matching leading prefix)."""
+    return prefix + instructions
 
 
 def parse_json_safe(output_text, step_name):
     """Try to parse model output JSON safely."""
     try:
-        return json.loads(output_text)
+        return json_loads(output_text)
     except json.JSONDecodeError:
         print(f"\n❌ JSON ERROR in {step_name}. Output is not valid JSON.")
         print("--------------------------------------------------------")
@@ -50,7 +117,7 @@ def main():
     parser.add_argument("--step4", required=True)
     args = parser.parse_args()
 
-    paper_text = load_text(args.input)
+    prefix = paper_prefix(load_text(args.input))
 
     #
     # STEP 1 — Extract experiment groups
@@ -60,10 +127,9 @@ def main():
     print("==============================\n")
 
     prompt1 = load_text(args.step1)
-    step1_prompt = prompt1 + "\n" + paper_text
-    step1_output = run_ollama(step1_prompt)
+    step1_prompt = build_prompt(prefix, prompt1)
+    step1_output = run_ollama(step1_prompt, "step1_output.json")
 
-    Path("step1_output.json").write_text(step1_output, encoding="utf-8")
     extracted_json = parse_json_safe(step1_output, "STEP1")
     if extracted_json is None:
         return
@@ -76,13 +142,12 @@ def main():
     print("==============================\n")
 
     template2 = load_text(args.step2)
-    step2_prompt = (
-        template2.replace("{{PAPER_TEXT}}", paper_text)
-                 .replace("{{EXTRACTION_JSON}}", json.dumps(extracted_json, indent=2))
+    # step outputs are already validated as JSON -> splice them as-is (no dumps round-trip)
+    step2_prompt = build_prompt(
+        prefix, template2.replace("{{EXTRACTION_JSON}}", step1_output.strip())
     )
-    step2_output = run_ollama(step2_prompt)
+    step2_output = run_ollama(step2_prompt, "step2_output.json")
 
-    Path("step2_output.json").write_text(step2_output, encoding="utf-8")
     verified_step2 = parse_json_safe(step2_output, "STEP2")
     if verified_step2 is None:
         return
@@ -95,13 +160,11 @@ def main():
     print("==============================\n")
 
     template3 = load_text(args.step3)
-    step3_prompt = (
-        template3.replace("{{PAPER_TEXT}}", paper_text)
-                 .replace("{{EXTRACTION_JSON}}", json.dumps(verified_step2, indent=2))
+    step3_prompt = build_prompt(
+        prefix, template3.replace("{{EXTRACTION_JSON}}", step2_output.strip())
     )
-    step3_output = run_ollama(step3_prompt)
+    step3_output = run_ollama(step3_prompt, "step3_output.json")
 
-    Path("step3_output.json").write_text(step3_output, encoding="utf-8")
     step3_json = parse_json_safe(step3_output, "STEP3")
     if step3_json is None:
         return
@@ -114,13 +177,11 @@ def main():
     print("==============================\n")
 
     template4 = load_text(args.step4)
-    step4_prompt = (
-        template4.replace("{{PAPER_TEXT}}", paper_text)
-                 .replace("{{EXTRACTION_JSON}}", json.dumps(step3_json, indent=2))
+    step4_prompt = build_prompt(
+        prefix, template4.replace("{{EXTRACTION_JSON}}", step3_output.strip())
     )
-    step4_output = run_ollama(step4_prompt)
+    step4_output = run_ollama(step4_prompt, "step4_output.json")
 
-    Path("step4_output.json").write_text(step4_output, encoding="utf-8")
     step4_json = parse_json_safe(step4_output, "STEP4")
     if step4_json is None:
         return
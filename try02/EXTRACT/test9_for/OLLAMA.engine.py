@@ -1,43 +1,113 @@
-import subprocess
 import json
 import argparse
+import hashlib
+import mmap
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-MODEL = "qwen3:30b-a3b-instruct-2507-q4_K_M"
+import requests
+from requests.adapters import HTTPAdapter
 
+# orjson (Rust parser) when available; its JSONDecodeError subclasses json's
+try:
+    import orjson
+    json_loads = orjson.loads
 
-def run_ollama(prompt_text: str):
-    """Run Ollama model and return output string."""
-    cmd = ["ollama", "run", MODEL]
-    process = subprocess.Popen(
-        cmd,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True
-    )
-    out, err = process.communicate(input=prompt_text)
+    def json_dumps(obj):
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+except ImportError:
+    json_loads = json.loads
 
-    if err and err.strip():
-        print("[Error]", err)
+    def json_dumps(obj):
+        return json.dumps(obj, indent=2, ensure_ascii=False)
 
+MODEL = "qwen3:30b-a3b-instruct-2507-q4_K_M"
+OLLAMA_URL = "http://localhost:11434/api/generate"
+KEEP_ALIVE = "1h"   # keep the model resident between calls
+
+# Reused HTTP keep-alive session (no `ollama run` process per call)
+_SESSION = requests.Session()
+# one pooled connection per concurrent group worker
+_SESSION.mount("http://", HTTPAdapter(pool_maxsize=32))
+
+# On-disk response cache keyed by sha256(model + prompt)
+CACHE_DIR = Path("cache")
+
+
+def _generate(prompt_text: str, out_path: str):
+    """Run Ollama model and return output string.
+    Output is written to out_path as it is generated."""
+    # Stream tokens straight into out_path while the model is still generating
+    pieces = []
+    with _SESSION.post(
+        OLLAMA_URL,
+        json={
+            "model": MODEL,
+            "prompt": prompt_text,
+            "stream": True,
+            "keep_alive": KEEP_ALIVE,
+        },
+        stream=True,
+    ) as resp, open(out_path, "w", encoding="utf-8") as f:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            msg = json_loads(line)
+            piece = msg.get("response", "")
+            if piece:
+                f.write(piece)
+                pieces.append(piece)
+            if msg.get("done"):
+                break
+    return "".join(pieces)
+
+
+def run_ollama(prompt_text: str, out_path: str):
+    """Same as _generate, but identical (model, prompt) pairs are served from cache/."""
+    key = hashlib.sha256(f"{MODEL}\0{prompt_text}".encode("utf-8")).hexdigest()
+    cache_path = CACHE_DIR / f"{key}.txt"
+    if cache_path.exists():
+        print(f"[cache hit] {key[:12]}")
+        out = cache_path.read_text(encoding="utf-8")
+        Path(out_path).write_bytes(out.encode("utf-8"))
+        return out
+
+    out = _generate(prompt_text, out_path)
+
+    # write to a temp file first, then atomically move into place
+    CACHE_DIR.mkdir(exist_ok=True)
+    tmp_path = cache_path.with_name(f"{key}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp_path.write_bytes(out.encode("utf-8"))
+    os.replace(tmp_path, cache_path)
     return out
 
 
 def load_text(path):
-    return Path(path).read_text(encoding="utf-8")
+    """Decode the file straight from a read-only mmap (no intermediate bytes copy)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return ""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return str(mm, "utf-8")
 
 
 def save_json(obj, path):
-    Path(path).write_text(
-        json.dumps(obj, indent=2, ensure_ascii=False),
-        encoding="utf-8"
-    )
+    Path(path).write_bytes(json_dumps(obj).encode("utf-8"))
+
+
+def split_group_template(template, paper_text):
+    """Fill {{PAPER_TEXT}} once and split at {{GROUP_JSON}} -> (head, tail).
+    Per-group prompts are then a single join instead of two full-length replaces."""
+    head, _, tail = template.partition("{{GROUP_JSON}}")
+    return head.replace("{{PAPER_TEXT}}", paper_text), tail.replace("{{PAPER_TEXT}}", paper_text)
 
 
 def try_json_load(txt):
     try:
-        return json.loads(txt)
+        return json_loads(txt)
     except Exception:
         return None
 
@@ -49,6 +119,8 @@ def main():
     parser.add_argument("--step2", required=True)
     parser.add_argument("--step3", required=True)
     parser.add_argument("--step4", required=True)
+    parser.add_argument("--workers", type=int, default=8,
+                        help="Concurrent per-group requests (start Ollama with OLLAMA_NUM_PARALLEL >= this)")
     args = parser.parse_args()
 
     # Load base texts
@@ -66,11 +138,9 @@ def main():
     print("==============================\n")
 
     step1_prompt = prompt1 + "\n" + paper_text
-    step1_output = run_ollama(step1_prompt)
+    step1_output = run_ollama(step1_prompt, "step1_output.json")
     print(step1_output)
 
-    Path("step1_output.json").write_text(step1_output, encoding="utf-8")
-
     groups_json = try_json_load(step1_output)
     if groups_json is None:
         print("❌ STEP1 FAIL: Output is not valid JSON.")
@@ -83,17 +153,16 @@ def main():
     print(" [STEP 2] Verify RAW extracted groups")
     print("==============================\n")
 
+    # step1 output already validated as JSON -> splice it as-is (no dumps round-trip)
     step2_prompt = (
         prompt2
             .replace("{{PAPER_TEXT}}", paper_text)
-            .replace("{{EXTRACTION_JSON}}", json.dumps(groups_json, indent=2))
+            .replace("{{EXTRACTION_JSON}}", step1_output.strip())
     )
 
-    step2_output = run_ollama(step2_prompt)
+    step2_output = run_ollama(step2_prompt, "step2_output.json")
     print(step2_output)
 
-    Path("step2_output.json").write_text(step2_output, encoding="utf-8")
-
     verified_json = try_json_load(step2_output)
     if verified_json is None:
         print("❌ STEP2 FAIL: Output invalid JSON.")
@@ -108,22 +177,24 @@ def main():
     print(" [STEP 3] Extract variable/constants per group")
     print("==============================\n")
 
-    step3_results = []
-
-    for idx, group in enumerate(verified_groups):
-        print(f"\n--- STEP3 GROUP {idx+1}/{len(verified_groups)} ---\n")
+    head3, tail3 = split_group_template(prompt3, paper_text)
 
-        step3_prompt = (
-            prompt3
-                .replace("{{PAPER_TEXT}}", paper_text)
-                .replace("{{GROUP_JSON}}", json.dumps(group, indent=2))
-        )
+    def run_step3(idx, group):
+        step3_prompt = "".join((head3, json.dumps(group, indent=2), tail3))
+        return run_ollama(step3_prompt, f"step3_group_{idx+1}.json")
 
-        step3_out = run_ollama(step3_prompt)
-        print(step3_out)
-
-        Path(f"step3_group_{idx+1}.json").write_text(step3_out, encoding="utf-8")
+    # groups are independent -> send them concurrently, keep results in group order
+    step3_outs = [None] * len(verified_groups)
+    with ThreadPoolExecutor(max_workers=args.workers) as ex:
+        futures = {ex.submit(run_step3, idx, g): idx for idx, g in enumerate(verified_groups)}
+        for fut in as_completed(futures):
+            idx = futures[fut]
+            step3_outs[idx] = fut.result()
+            print(f"\n--- STEP3 GROUP {idx+1}/{len(verified_groups)} ---\n")
+            print(step3_outs[idx])
 
+    step3_results = []
+    for idx, step3_out in enumerate(step3_outs):
         parsed = try_json_load(step3_out)
         if parsed:
             step3_results.append(parsed)
@@ -137,22 +208,23 @@ def main():
     print(" [STEP 4] Verify variable/constants per group")
     print("==============================\n")
 
-    final_groups = []
-
-    for idx, group3 in enumerate(step3_results):
-        print(f"\n--- STEP4 GROUP {idx+1}/{len(step3_results)} ---\n")
+    head4, tail4 = split_group_template(prompt4, paper_text)
 
-        step4_prompt = (
-            prompt4
-                .replace("{{PAPER_TEXT}}", paper_text)
-                .replace("{{GROUP_JSON}}", json.dumps(group3, indent=2))
-        )
+    def run_step4(idx, group3):
+        step4_prompt = "".join((head4, json.dumps(group3, indent=2), tail4))
+        return run_ollama(step4_prompt, f"step4_group_{idx+1}.json")
 
-        step4_out = run_ollama(step4_prompt)
-        print(step4_out)
-
-        Path(f"step4_group_{idx+1}.json").write_text(step4_out, encoding="utf-8")
+    step4_outs = [None] * len(step3_results)
+    with ThreadPoolExecutor(max_workers=args.workers) as ex:
+        futures = {ex.submit(run_step4, idx, g): idx for idx, g in enumerate(step3_results)}
+        for fut in as_completed(futures):
+            idx = futures[fut]
+            step4_outs[idx] = fut.result()
+            print(f"\n--- STEP4 GROUP {idx+1}/{len(step3_results)} ---\n")
+            print(step4_outs[idx])
 
+    final_groups = []
+    for idx, step4_out in enumerate(step4_outs):
         parsed4 = try_json_load(step4_out)
         if parsed4:
             if parsed4.get("removed") is True:
@@ -41,10 +41,12 @@ def run_ollama(model: str, full_prompt: str):
         stdin=subprocess.PIPE,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True,
     )
 
-    out, err = process.communicate(full_prompt)
+    # bytes 로 주고받고 끝에서 한 번만 decode (TextIOWrapper 의 incremental decode X)
+    out, err = process.communicate(full_prompt.encode("utf-8"))
+    out = out.decode("utf-8")
+    err = err.decode("utf-8", errors="replace")
 
     if err:
         logging.warning(f"Ollama STDERR: {err.strip()}")
@@ -8,14 +8,23 @@ CSV Batch Ollama Classifier
 """
 
 import argparse
+import hashlib
+import json
 import logging
-import subprocess
 from datetime import datetime
 from tqdm import tqdm
 import os
 import sys
 import shutil
 import pandas as pd
+import requests
+
+# orjson 이 있으면 사용 (Rust parser, bytes 를 바로 받음), 없으면 stdlib json
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
 
 # ------------------------------------------------------------
 # Logging
@@ -30,27 +39,101 @@ logging.basicConfig(
 # ------------------------------------------------------------
 # Ollama runner
 # ------------------------------------------------------------
-def run_ollama(model: str, full_prompt: str):
-    cmd = [
-        "ollama", "run",
-        model,
-        "--format", "json"
-    ]
+OLLAMA_URL = "http://localhost:11434/api/generate"
+_SESSION = requests.Session()
+
+
+def run_ollama(model: str, full_prompt: str, out_path: str):
+    # 같은 session 으로 HTTP API 호출 (row 마다 `ollama run` 프로세스 생성 X)
+    payload = {
+        "model": model,
+        "prompt": full_prompt,
+        "stream": True,
+        "keep_alive": "30m",   # row 사이에 모델을 VRAM 에 유지
+        "format": "json",
+    }
+
+    # 생성되는 token 을 바로 out_path 에 기록 (생성과 disk I/O overlap)
+    pieces = []
+    with _SESSION.post(OLLAMA_URL, json=payload, stream=True) as resp, \
+            open(out_path, "w", encoding="utf-8") as f:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            msg = json_loads(line)
+            piece = msg.get("response", "")
+            if piece:
+                f.write(piece)
+                pieces.append(piece)
+            if msg.get("done"):
+                break
+
+    return "".join(pieces).strip()
+
+
+# ------------------------------------------------------------
+# Resume check
+# ------------------------------------------------------------
+def has_result(result_path: str) -> bool:
+    # result.json 이 있고, 비어있지 않고, JSON 으로 parse 되면 완료된 row
+    try:
+        with open(result_path, "rb") as f:
+            json_loads(f.read())
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+# ------------------------------------------------------------
+# Run manifest
+# ------------------------------------------------------------
+# run 폴더마다 어떤 (model, prompt template, 입력 text) 로 만든 결과인지 기록
+# → --resume / 중복 재사용은 key 가 정확히 같은 결과만 사용 (다른 CSV·prompt·model 의 결과 X)
+MANIFEST = "manifest.json"
+
 
-    process = subprocess.Popen(
-        cmd,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
+def sha256_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
 
-    out, err = process.communicate(full_prompt)
 
-    if err:
-        logging.warning(f"Ollama STDERR: {err.strip()}")
+def run_key(model: str, full_prompt: str) -> str:
+    # full_prompt = template + 입력 text 이므로 model + full_prompt 로 세 가지 모두 구분됨
+    return sha256_text(f"{model}\0{full_prompt}")
 
-    return out.strip()
+
+def write_manifest(run_dir: str, model: str, template_bytes: bytes, abstract_text: str, key: str):
+    manifest = {
+        "model": model,
+        "prompt_sha256": hashlib.sha256(template_bytes).hexdigest(),
+        "text_sha256": sha256_text(abstract_text),
+        "key": key,
+    }
+    with open(os.path.join(run_dir, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+
+def read_manifest_key(run_dir: str):
+    try:
+        with open(os.path.join(run_dir, MANIFEST), "rb") as f:
+            return json_loads(f.read()).get("key")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+# ------------------------------------------------------------
+# Prompt template copy
+# ------------------------------------------------------------
+def link_template(ref_path: str, dst_path: str, template_bytes: bytes):
+    # outdir 의 reference copy 를 hardlink (row 마다 실제 파일 복사 X)
+    try:
+        if os.path.lexists(dst_path):
+            os.remove(dst_path)
+        os.link(ref_path, dst_path)
+    except OSError:
+        # hardlink 불가 (다른 device / 지원 X filesystem) → 그냥 쓰기
+        with open(dst_path, "wb") as f:
+            f.write(template_bytes)
 
 
 # ------------------------------------------------------------
@@ -65,6 +148,8 @@ def main():
     parser.add_argument("--model", default="qwen3:30b-a3b-instruct-2507-q4_K_M", help="Ollama model name")
     parser.add_argument("--outdir", default="results_csv", help="Root output directory")
     parser.add_argument("--limit", type=int, default=None, help="Only process first N rows for test")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip rows whose result.json is valid JSON and was made with the same model/prompt/text")
 
     args = parser.parse_args()
 
@@ -86,48 +171,112 @@ def main():
     # Load prompt template
     # -----------------------------------
     logging.info(f"Loading prompt template: {args.prompt}")
-    with open(args.prompt, "r", encoding="utf-8") as f:
-        prompt_template = f.read()
+    with open(args.prompt, "rb") as f:
+        template_bytes = f.read()   # row 마다 prompt 파일을 다시 읽지 않도록 한 번만 읽음
+    prompt_template = template_bytes.decode("utf-8")
+
+    # 모든 run 폴더가 hardlink 할 reference copy (outdir 에 한 번만 기록)
+    # 새 inode 로 교체해야 이전 run 폴더의 hardlink 내용이 바뀌지 않음 → tmp + os.replace
+    ref_path = os.path.join(args.outdir, "prompt_template.txt")
+    tmp_path = f"{ref_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(template_bytes)
+    os.replace(tmp_path, ref_path)
 
     if "<<<ABSTRACT>>>" not in prompt_template:
         logging.warning("Prompt missing <<<ABSTRACT>>> placeholder. Adding at bottom.")
         prompt_template += "\n<<<ABSTRACT>>>"
 
+    # placeholder 기준으로 한 번만 split → row 마다 template 전체를 scan 하지 않음
+    prompt_pre, prompt_post = prompt_template.split("<<<ABSTRACT>>>", 1)
+
     # -----------------------------------
     # Processing rows with tqdm
     # -----------------------------------
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Processing rows"):
-        abstract_text = str(row[args.text_col]).strip()
+    # 입력 텍스트를 loop 밖에서 한 번에 list 로 (row 마다 Series 생성 X)
+    texts = df[args.text_col].astype(str).str.strip().tolist()
+
+    # timestamp 는 실행 시작 시 한 번만 (row 구분은 idx 로 충분)
+    # 같은 초에 시작한 두 실행 (예: 바로 죽고 --resume 재실행) 이 폴더 이름을 공유하지 않도록 pid 를 붙임
+    ts_base = f"{datetime.now():%Y%m%d_%H%M%S}_{os.getpid()}"
+
+    # 같은 (model, prompt) 는 run 안에서 한 번만 모델 호출 (run_key → 첫 result.json 경로)
+    done = {}
+    failed = []
+
+    # --resume: 이전 실행의 run_*_{idx} 폴더 중 result.json 이 정상이고
+    #           manifest key 가 지금 (model, prompt, text) 와 같은 row 만 건너뜀
+    finished = set()
+    if args.resume:
+        for name in os.listdir(args.outdir):
+            row = name.rsplit("_", 1)[-1]
+            if name.startswith("run_") and row.isdigit():
+                run_dir = os.path.join(args.outdir, name)
+                result_path = os.path.join(run_dir, "result.json")
+                key = read_manifest_key(run_dir)
+                if key and has_result(result_path):
+                    finished.add((int(row), key))
+                    done.setdefault(key, result_path)
+        logging.info(f"Resume: {len(finished)} finished run folders with manifest")
+
+    for idx, abstract_text in enumerate(tqdm(texts, desc="Processing rows")):
 
         # Substitute prompt
-        full_prompt = prompt_template.replace("<<<ABSTRACT>>>", abstract_text)
+        full_prompt = prompt_pre + abstract_text + prompt_post
+        key = run_key(args.model, full_prompt)
+
+        if (idx, key) in finished:
+            continue
 
-        # Create per-run folder
-        ts = datetime.now().strftime("%Y%m%d_%H%M%S")
-        run_dir = os.path.join(args.outdir, f"run_{ts}_{idx}")
-        os.makedirs(run_dir, exist_ok=True)
+        # Create per-run folder (outdir 는 위에서 이미 생성 → parent stat 불필요)
+        run_dir = os.path.join(args.outdir, f"run_{ts_base}_{idx}")
+        try:
+            os.mkdir(run_dir)
+        except FileExistsError:
+            # pid 재사용 등으로 이름이 겹치면 이전 폴더를 덮어쓰지 않고 새 이름으로
+            run_dir = os.path.join(args.outdir, f"run_{ts_base}_{datetime.now():%f}_{idx}")
+            os.mkdir(run_dir)
 
-        # Run model
-        result = run_ollama(args.model, full_prompt)
+        # 한 row 의 실패 (HTTP 404/500, 연결 끊김 등) 로 전체 batch 가 멈추지 않게 row 단위로 처리
+        # (실패한 row 는 manifest 가 없으므로 --resume 에서 다시 시도됨)
+        try:
+            # Run model (result.json 은 생성되는 동안 바로 기록됨)
+            result_path = os.path.join(run_dir, "result.json")
+            if key in done:
+                # 중복 row → 모델 호출 없이 이전 result.json 복사
+                shutil.copyfile(done[key], result_path)
+                logging.info(f"[Row {idx}] duplicate input, reused {done[key]}")
+            else:
+                run_ollama(args.model, full_prompt, result_path)
+                done[key] = result_path
 
-        # Save result.json
-        with open(os.path.join(run_dir, "result.json"), "w", encoding="utf-8") as f:
-            f.write(result)
+            # Save prompt used
+            with open(os.path.join(run_dir, "prompt_used.txt"), "wb") as f:
+                f.write(full_prompt.encode("utf-8"))
 
-        # Save prompt used
-        with open(os.path.join(run_dir, "prompt_used.txt"), "w", encoding="utf-8") as f:
-            f.write(full_prompt)
+            # Save input text
+            with open(os.path.join(run_dir, "input.txt"), "wb") as f:
+                f.write(abstract_text.encode("utf-8"))
 
-        # Save input text
-        with open(os.path.join(run_dir, "input.txt"), "w", encoding="utf-8") as f:
-            f.write(abstract_text)
+            # Save prompt template
+            link_template(
+                os.path.join(args.outdir, "prompt_template.txt"),
+                os.path.join(run_dir, "prompt_template.txt"),
+                template_bytes,
+            )
 
-        # Save prompt template
-        shutil.copy(args.prompt, os.path.join(run_dir, "prompt_template.txt"))
+            # manifest 는 마지막에 기록 → manifest 가 있으면 완료된 run 폴더
+            write_manifest(run_dir, args.model, template_bytes, abstract_text, key)
 
-        logging.info(f"[Row {idx}] Saved → {run_dir}")
+            logging.info(f"[Row {idx}] Saved → {run_dir}")
+        except Exception as e:
+            logging.error(f"[Row {idx}] Failed: {e}")
+            failed.append(idx)
 
-    logging.info("All rows processed successfully.")
+    if failed:
+        logging.warning(f"{len(failed)} rows failed (rerun with --resume to retry): {failed}")
+    else:
+        logging.info("All rows processed successfully.")
 
 
 if __name__ == "__main__":
@@ -6,19 +6,33 @@ CSV Batch Ollama Classifier
 - 결과는 source_file 이름으로 폴더 생성 후 저장
 - all.log + fail.log 동시에 기록
 - tqdm + logging
+- asyncio 로 여러 row 를 동시에 요청 (OLLAMA_NUM_PARALLEL 과 함께 사용)
 """
 
 import argparse
+import asyncio
+import hashlib
+import json
 import logging
-import subprocess
 from datetime import datetime
+from functools import lru_cache
 from tqdm import tqdm
 import os
 import sys
-import shutil
+import threading
+from concurrent.futures import Future
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
 import re
 
+# orjson 이 있으면 사용 (Rust parser, bytes 를 바로 받음), 없으면 stdlib json
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 
 # ------------------------------------------------------------
 # Logging
@@ -44,37 +58,221 @@ fail_logger.setLevel(logging.INFO)
 # ------------------------------------------------------------
 # Ollama runner
 # ------------------------------------------------------------
-def run_ollama(model: str, full_prompt: str):
-    cmd = [
-        "ollama", "run",
-        model,
-        "--format", "json"
-    ]
+OLLAMA_URL = "http://localhost:11434/api/generate"
+_SESSION = requests.Session()
+# 동시 요청 수만큼 connection pool 확보
+_SESSION.mount("http://", HTTPAdapter(pool_maxsize=32))
+
+
+def run_ollama(model: str, full_prompt: str, out_path: str):
+    # 같은 session 으로 HTTP API 호출 (row 마다 `ollama run` 프로세스 생성 X)
+    payload = {
+        "model": model,
+        "prompt": full_prompt,
+        "stream": True,
+        "keep_alive": "30m",   # row 사이에 모델을 VRAM 에 유지
+        "format": "json",
+    }
+
+    # 생성되는 token 을 바로 out_path 에 기록 (생성과 disk I/O overlap)
+    pieces = []
+    with _SESSION.post(OLLAMA_URL, json=payload, stream=True) as resp, \
+            open(out_path, "w", encoding="utf-8") as f:
+        resp.raise_for_status()
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            msg = json_loads(line)
+            piece = msg.get("response", "")
+            if piece:
+                f.write(piece)
+                pieces.append(piece)
+            if msg.get("done"):
+                break
+
+    return "".join(pieces).strip()
+
+
+# 같은 (model, prompt) 는 run 안에서 한 번만 호출 → 이후 row 는 첫 결과를 그대로 기록
+# (동시에 들어온 중복 요청은 먼저 시작한 요청의 Future 를 기다림)
+# 원본 result.json 은 다른 row 가 같은 폴더에 다시 쓸 수 있으므로 복사하지 않고 결과 bytes 를 Future 에 담음
+_INFLIGHT = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def run_ollama_dedup(model: str, full_prompt: str, out_path: str):
+    key = hashlib.sha256(f"{model}\0{full_prompt}".encode("utf-8")).hexdigest()
+    with _INFLIGHT_LOCK:
+        fut = _INFLIGHT.get(key)
+        owner = fut is None
+        if owner:
+            fut = _INFLIGHT[key] = Future()
+
+    if owner:
+        try:
+            result = run_ollama(model, full_prompt, out_path)
+        except BaseException as e:
+            # 실패한 key 는 지워서 다음 중복 row 가 다시 시도하도록
+            with _INFLIGHT_LOCK:
+                del _INFLIGHT[key]
+            fut.set_exception(e)
+            raise
+        with open(out_path, "rb") as f:
+            data = f.read()
+        fut.set_result((out_path, data, result))
+        return result
+
+    src_path, data, result = fut.result()
+    if os.path.abspath(src_path) != os.path.abspath(out_path):
+        with open(out_path, "wb") as f:
+            f.write(data)
+    logging.info(f"duplicate input, reused {src_path}")
+    return result
 
-    process = subprocess.Popen(
-        cmd,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
 
-    out, err = process.communicate(full_prompt)
+# ------------------------------------------------------------
+# Safe folder name
+# ------------------------------------------------------------
+_UNSAFE_CHARS = re.compile(r"[^\w\-.]")
 
-    if err:
-        logging.warning(f"Ollama STDERR: {err.strip()}")
 
-    return out.strip()
+@lru_cache(maxsize=65536)
+def safe_folder_name(name: str):
+    return _UNSAFE_CHARS.sub("_", str(name).strip())   # 위험문자 → _
 
 
 # ------------------------------------------------------------
-# Safe folder name
+# Output folders
 # ------------------------------------------------------------
-def safe_folder_name(name: str):
-    name = str(name)
-    name = name.strip()
-    name = re.sub(r"[^\w\-.]", "_", name)   # 위험문자 → _
-    return name
+_MADE_DIRS = set()
+
+
+def ensure_dir(path: str):
+    # 이번 run 에서 이미 만든 폴더는 다시 makedirs (stat syscall) 하지 않음
+    if path not in _MADE_DIRS:
+        os.makedirs(path, exist_ok=True)
+        _MADE_DIRS.add(path)
+
+
+# 같은 source_file 을 가진 row 들은 같은 run 폴더를 씀 → 폴더 단위로 직렬화
+# (동시에 돌면 result.json / input.txt 등이 서로 섞이거나 잘림)
+_DIR_LOCKS = {}
+_DIR_LOCKS_LOCK = threading.Lock()
+
+
+def dir_lock(path: str) -> threading.Lock:
+    with _DIR_LOCKS_LOCK:
+        lock = _DIR_LOCKS.get(path)
+        if lock is None:
+            lock = _DIR_LOCKS[path] = threading.Lock()
+        return lock
+
+
+# ------------------------------------------------------------
+# Resume check
+# ------------------------------------------------------------
+def has_result(result_path: str) -> bool:
+    # result.json 이 있고, 비어있지 않고, JSON 으로 parse 되면 완료된 row
+    try:
+        with open(result_path, "rb") as f:
+            json_loads(f.read())
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+# ------------------------------------------------------------
+# Prompt template copy
+# ------------------------------------------------------------
+def link_template(ref_path: str, dst_path: str, template_bytes: bytes):
+    # outdir 의 reference copy 를 hardlink (row 마다 실제 파일 복사 X)
+    try:
+        if os.path.lexists(dst_path):
+            os.remove(dst_path)
+        os.link(ref_path, dst_path)
+    except OSError:
+        # hardlink 불가 (다른 device / 지원 X filesystem) → 그냥 쓰기
+        with open(dst_path, "wb") as f:
+            f.write(template_bytes)
+
+
+# ------------------------------------------------------------
+# Per-row processing
+# ------------------------------------------------------------
+def process_row(idx, abstract_text, source_name_raw, args, prompt_pre, prompt_post, template_bytes):
+    source_name = safe_folder_name(source_name_raw)
+
+    # Use source_file as folder name
+    run_dir = os.path.join(args.outdir, source_name)
+
+    with dir_lock(run_dir):
+        _process_row_locked(idx, abstract_text, source_name_raw, source_name, run_dir,
+                            args, prompt_pre, prompt_post, template_bytes)
+
+
+def _process_row_locked(idx, abstract_text, source_name_raw, source_name, run_dir,
+                        args, prompt_pre, prompt_post, template_bytes):
+    # --resume: 이미 정상 result.json 이 있는 row 는 모델 호출 없이 건너뜀
+    if args.resume and has_result(os.path.join(run_dir, "result.json")):
+        logging.info(f"[Row {idx}] SKIP (resume) → {run_dir}")
+        return
+
+    ensure_dir(run_dir)
+
+    # Build prompt
+    full_prompt = prompt_pre + abstract_text + prompt_post
+
+    try:
+        # Run model (result.json 은 생성되는 동안 바로 기록됨)
+        result = run_ollama_dedup(args.model, full_prompt, os.path.join(run_dir, "result.json"))
+
+        # Save used prompt
+        with open(os.path.join(run_dir, "prompt_used.txt"), "wb") as f:
+            f.write(full_prompt.encode("utf-8"))
+
+        # Save abstract input
+        with open(os.path.join(run_dir, "input.txt"), "wb") as f:
+            f.write(abstract_text.encode("utf-8"))
+
+        # Save original prompt copy
+        link_template(
+            os.path.join(args.outdir, "prompt_template.txt"),
+            os.path.join(run_dir, "prompt_template.txt"),
+            template_bytes,
+        )
+
+        logging.info(f"[Row {idx}] OK → {run_dir}")
+
+        # If JSON contains an error → log to fail
+        if not result or "pyrolysis_related" not in result:
+            fail_logger.info(f"{source_name_raw} | Missing JSON field")
+
+    except Exception as e:
+        fail_logger.info(f"{source_name_raw} | ERROR: {str(e)}")
+        logging.error(f"Failed: {source_name_raw} | {e}")
+
+
+async def process_all(df, args, prompt_pre, prompt_post, template_bytes):
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(idx, abstract_text, source_name_raw):
+        async with sem:
+            # HTTP 호출은 blocking 이므로 worker thread 에서 실행
+            await asyncio.to_thread(
+                process_row, idx, abstract_text, source_name_raw, args,
+                prompt_pre, prompt_post, template_bytes,
+            )
+
+    # 입력 컬럼을 loop 밖에서 한 번에 list 로 (row 마다 Series 생성 X)
+    texts = df[args.text_col].astype(str).str.strip().tolist()
+    sources = df[args.sf_col].astype(str).tolist()
+
+    tasks = [
+        bounded(idx, abstract_text, source_name_raw)
+        for idx, (abstract_text, source_name_raw) in enumerate(zip(texts, sources))
+    ]
+    for fut in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Processing rows"):
+        await fut
 
 
 # ------------------------------------------------------------
@@ -90,6 +288,10 @@ def main():
     parser.add_argument("--model", default="qwen3:30b-a3b-instruct-2507-q4_K_M", help="Ollama model name")
     parser.add_argument("--outdir", default="results_csv", help="Root output directory")
     parser.add_argument("--limit", type=int, default=None, help="Process only N rows for testing")
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip rows whose result.json already exists and is valid JSON")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Concurrent requests (start Ollama with OLLAMA_NUM_PARALLEL >= this)")
 
     args = parser.parse_args()
 
@@ -111,55 +313,27 @@ def main():
 
     # Load prompt
     logging.info(f"Loading prompt: {args.prompt}")
-    with open(args.prompt, "r", encoding="utf-8") as f:
-        prompt_template = f.read()
+    with open(args.prompt, "rb") as f:
+        template_bytes = f.read()   # row 마다 prompt 파일을 다시 읽지 않도록 한 번만 읽음
+    prompt_template = template_bytes.decode("utf-8")
+
+    # 모든 run 폴더가 hardlink 할 reference copy (outdir 에 한 번만 기록)
+    # 새 inode 로 교체해야 이전 run 폴더의 hardlink 내용이 바뀌지 않음 → tmp + os.replace
+    ref_path = os.path.join(args.outdir, "prompt_template.txt")
+    tmp_path = f"{ref_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(template_bytes)
+    os.replace(tmp_path, ref_path)
 
     if "<<<ABSTRACT>>>" not in prompt_template:
         logging.warning("Prompt missing <<<ABSTRACT>>> placeholder. Adding at bottom.")
         prompt_template += "\n<<<ABSTRACT>>>"
 
-    # Process rows
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Processing rows"):
-
-        abstract_text = str(row[args.text_col]).strip()
-        source_name_raw = str(row[args.sf_col])
-        source_name = safe_folder_name(source_name_raw)
-
-        # Use source_file as folder name
-        run_dir = os.path.join(args.outdir, source_name)
-        os.makedirs(run_dir, exist_ok=True)
-
-        # Build prompt
-        full_prompt = prompt_template.replace("<<<ABSTRACT>>>", abstract_text)
-
-        try:
-            result = run_ollama(args.model, full_prompt)
-
-            # Save result.json
-            with open(os.path.join(run_dir, "result.json"), "w", encoding="utf-8") as f:
-                f.write(result)
-
-            # Save used prompt
-            with open(os.path.join(run_dir, "prompt_used.txt"), "w", encoding="utf-8") as f:
-                f.write(full_prompt)
-
-            # Save abstract input
-            with open(os.path.join(run_dir, "input.txt"), "w", encoding="utf-8") as f:
-                f.write(abstract_text)
-
-            # Save original prompt copy
-            shutil.copy(args.prompt, os.path.join(run_dir, "prompt_template.txt"))
-
-            logging.info(f"[Row {idx}] OK → {run_dir}")
-
-            # If JSON contains an error → log to fail
-            if not result or "pyrolysis_related" not in result:
-                fail_logger.info(f"{source_name_raw} | Missing JSON field")
-
-        except Exception as e:
-            fail_logger.info(f"{source_name_raw} | ERROR: {str(e)}")
-            logging.error(f"Failed: {source_name_raw} | {e}")
+    # placeholder 기준으로 한 번만 split → row 마다 template 전체를 scan 하지 않음
+    prompt_pre, prompt_post = prompt_template.split("<<<ABSTRACT>>>", 1)
 
+    # Process rows (동시에 최대 --concurrency 개 요청 → Ollama 서버에서 continuous batching)
+    asyncio.run(process_all(df, args, prompt_pre, prompt_post, template_bytes))
 
     logging.info("All rows processed.")
 
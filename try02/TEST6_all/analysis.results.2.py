@@ -9,97 +9,104 @@ import os
 import json
 import csv
 import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
+# orjson 이 있으면 사용 (Rust parser, bytes 를 바로 받음), 없으면 stdlib json
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s | %(levelname)s | %(message)s"
 )
 
 
-def scan_results(root_folder):
-    """
-    qwen_results_test 내부 폴더들을 순회하며
-    input.txt + result.json 을 파싱.
-    """
-    data = []
+def _parse_one(folder):
+    """서브폴더 하나의 input.txt + result.json 을 파싱 (스킵/실패 시 None)"""
+    input_path = os.path.join(folder, "input.txt")
+    result_path = os.path.join(folder, "result.json")
 
-    # 모든 서브폴더 리스트
-    subfolders = [
-        os.path.join(root_folder, d)
-        for d in os.listdir(root_folder)
-        if os.path.isdir(os.path.join(root_folder, d))
-    ]
+    # input.txt 없는 폴더는 스킵
+    # 두 파일 존재 여부를 readdir 한 번으로 확인 (stat 두 번 X)
+    with os.scandir(folder) as it:
+        names = {e.name for e in it}
+    if "input.txt" not in names or "result.json" not in names:
+        return None
 
-    for folder in tqdm(subfolders, desc="Scanning result folders"):
-        input_path = os.path.join(folder, "input.txt")
-        result_path = os.path.join(folder, "result.json")
+    try:
+        # input.txt = title + abstract
+        with open(input_path, "r", encoding="utf-8") as f:
+            abstract = f.read().strip()
 
-        # input.txt 없는 폴더는 스킵
-        if not os.path.exists(input_path) or not os.path.exists(result_path):
-            continue
+        # result.json = pyrolysis_related, reason
+        with open(result_path, "rb") as f:
+            result = json_loads(f.read())
 
-        try:
-            # input.txt = title + abstract
-            with open(input_path, "r", encoding="utf-8") as f:
-                abstract = f.read().strip()
+        pyro = result.get("pyrolysis_related", "")
+        reason = result.get("reason", "")
 
-            # result.json = pyrolysis_related, reason
-            with open(result_path, "r", encoding="utf-8") as f:
-                result = json.load(f)
+        return (abstract, pyro, reason)
 
-            pyro = result.get("pyrolysis_related", "")
-            reason = result.get("reason", "")
+    except Exception as e:
+        logging.error(f"Error reading {folder}: {e}")
+        return None
 
-            data.append({
-                "abstract": abstract,
-                "pyrolysis_related": pyro,
-                "reason": reason
-            })
 
-        except Exception as e:
-            logging.error(f"Error reading {folder}: {e}")
-            continue
-
-    return data
+def iter_results(root_folder, max_workers=32):
+    """
+    qwen_results_test 내부 폴더들을 순회하며
+    input.txt + result.json 을 파싱해서 row tuple 을 하나씩 yield (list 로 모으지 않음).
+    폴더 단위 I/O 가 서로 독립적이라 thread pool 로 동시에 읽음.
+    """
+    # 모든 서브폴더 리스트
+    # scandir 는 dirent 의 type 을 그대로 사용 → entry 마다 stat() 추가 호출 X
+    with os.scandir(root_folder) as it:
+        subfolders = [e.path for e in it if e.is_dir(follow_symlinks=False)]
 
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        for rec in tqdm(ex.map(_parse_one, subfolders), total=len(subfolders),
+                        desc="Scanning result folders",
+                        mininterval=1.0, miniters=1000, smoothing=0):
+            if rec:
+                yield rec
 
-def save_yes_to_csv(data, csv_path="yes_results.csv"):
-    yes_items = [d for d in data if d["pyrolysis_related"] == "YES"]
 
+def save_yes_to_csv(rows, csv_path="yes_results.csv"):
+    """scan 되는 대로 YES 만 바로 기록하고 YES/NO 도 같은 pass 에서 count → (yes, no, total)"""
     logging.info(f"Saving YES entries to CSV: {csv_path}")
 
+    # writerows 에 넘기는 동안 label 을 count 하고 YES 만 통과 (row loop 는 _csv (C) 안에서)
+    labels = Counter()
+
+    def yes_rows(rows):
+        for abstract, pyro, reason in rows:
+            labels[pyro] += 1
+            if pyro == "YES":
+                yield abstract, reason
+
     with open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
         writer = csv.writer(f)
         writer.writerow(["abstract", "reason"])
+        writer.writerows(yes_rows(rows))
 
-        for d in yes_items:
-            writer.writerow([d["abstract"], d["reason"]])
-
-    logging.info(f"Saved {len(yes_items)} YES rows to {csv_path}")
-
-
-def count_yes_no(data):
-    yes = sum(1 for d in data if d["pyrolysis_related"] == "YES")
-    no  = sum(1 for d in data if d["pyrolysis_related"] == "NO")
-    total = yes + no
-    return yes, no, total
+    logging.info(f"Saved {labels['YES']} YES rows to {csv_path}")
+    return labels["YES"], labels["NO"], labels["YES"] + labels["NO"]
 
 
 if __name__ == "__main__":
     ROOT = "qwen_results_test"
 
     logging.info("Starting scan...")
-    parsed = scan_results(ROOT)
-
-    yes, no, total = count_yes_no(parsed)
+    yes, no, total = save_yes_to_csv(iter_results(ROOT), "yes_results.csv")
 
     print("\n===== SUMMARY =====")
     print(f"YES: {yes}")
     print(f"NO: {no}")
     print(f"TOTAL: {total}")
 
-    save_yes_to_csv(parsed, "yes_results.csv")
     print("\nCSV saved: yes_results.csv")
-
-
@@ -12,6 +12,7 @@ import argparse
 import logging
 import subprocess
 from datetime import datetime
+from functools import lru_cache
 from tqdm import tqdm
 import os
 import sys
@@ -56,10 +57,12 @@ def run_ollama(model: str, full_prompt: str):
         stdin=subprocess.PIPE,
         stdout=subprocess.PIPE,
         stderr=subprocess.PIPE,
-        text=True,
     )
 
-    out, err = process.communicate(full_prompt)
+    # bytes 로 주고받고 끝에서 한 번만 decode (TextIOWrapper 의 incremental decode X)
+    out, err = process.communicate(full_prompt.encode("utf-8"))
+    out = out.decode("utf-8")
+    err = err.decode("utf-8", errors="replace")
 
     if err:
         logging.warning(f"Ollama STDERR: {err.strip()}")
@@ -70,11 +73,25 @@ def run_ollama(model: str, full_prompt: str):
 # ------------------------------------------------------------
 # Safe folder name
 # ------------------------------------------------------------
+_UNSAFE_CHARS = re.compile(r"[^\w\-.]")
+
+
+@lru_cache(maxsize=65536)
 def safe_folder_name(name: str):
-    name = str(name)
-    name = name.strip()
-    name = re.sub(r"[^\w\-.]", "_", name)   # 위험문자 → _
-    return name
+    return _UNSAFE_CHARS.sub("_", str(name).strip())   # 위험문자 → _
+
+
+# ------------------------------------------------------------
+# Output folders
+# ------------------------------------------------------------
+_MADE_DIRS = set()
+
+
+def ensure_dir(path: str):
+    # 이번 run 에서 이미 만든 폴더는 다시 makedirs (stat syscall) 하지 않음
+    if path not in _MADE_DIRS:
+        os.makedirs(path, exist_ok=True)
+        _MADE_DIRS.add(path)
 
 
 # ------------------------------------------------------------
@@ -118,16 +135,17 @@ def main():
         logging.warning("Prompt missing <<<ABSTRACT>>> placeholder. Adding at bottom.")
         prompt_template += "\n<<<ABSTRACT>>>"
 
-    # Process rows
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Processing rows"):
+    # Process rows (itertuples(name=None) → 필요한 컬럼만 plain tuple 로, row 마다 Series 생성 X)
+    rows = df[[args.text_col, args.sf_col]].itertuples(name=None)
+    for idx, text, source_name_raw in tqdm(rows, total=len(df), desc="Processing rows"):
 
-        abstract_text = str(row[args.text_col]).strip()
-        source_name_raw = str(row[args.sf_col])
+        abstract_text = str(text).strip()
+        source_name_raw = str(source_name_raw)
         source_name = safe_folder_name(source_name_raw)
 
         # Use source_file as folder name
         run_dir = os.path.join(args.outdir, source_name)
-        os.makedirs(run_dir, exist_ok=True)
+        ensure_dir(run_dir)
 
         # Build prompt
         full_prompt = prompt_template.replace("<<<ABSTRACT>>>", abstract_text)
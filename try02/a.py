@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 import requests
+from requests.adapters import HTTPAdapter
 import logging
+import random
+import threading
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from tqdm import tqdm
 
 logging.basicConfig(
@@ -14,21 +18,46 @@ HEADERS = {
     "User-Agent": "CrossrefHarvester/1.0 (mailto:your_email@example.com)"
 }
 
+# DOI 마다 새 TCP+TLS 연결을 맺지 않도록 keep-alive session 재사용
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0))
+
+# thread 전체가 공유하는 간단한 rate limiter (초당 RATE_PER_SEC 요청 간격 유지)
+RATE_PER_SEC = 10
+_rate_lock = threading.Lock()
+_next_slot = 0.0
+
+
+def _throttle():
+    global _next_slot
+    with _rate_lock:
+        now = time.monotonic()
+        wait = _next_slot - now
+        _next_slot = max(now, _next_slot) + 1.0 / RATE_PER_SEC
+    if wait > 0:
+        time.sleep(wait)
+
+
 def fetch_crossref(doi, max_retries=3):
     url = f"https://api.crossref.org/works/{doi}"
 
     for attempt in range(1, max_retries + 1):
         try:
-            r = requests.get(url, headers=HEADERS, timeout=10)
+            _throttle()
+            r = SESSION.get(url, timeout=10)
 
             # 정상 응답
             if r.status_code == 200:
                 return r.json()
 
-            # 너무 많이 요청한 경우 → backoff
+            # 너무 많이 요청한 경우 → Retry-After 우선, 없으면 jitter 가 들어간 exponential backoff
             if r.status_code == 429:
-                wait = 1.5 * attempt
-                logging.warning(f"Rate limited (429) → waiting {wait}s...")
+                try:
+                    wait = float(r.headers.get("Retry-After"))
+                except (TypeError, ValueError):
+                    wait = min(60, 2 ** attempt + random.uniform(0, 1))
+                logging.warning(f"Rate limited (429) → waiting {wait:.1f}s...")
                 time.sleep(wait)
                 continue
 
@@ -59,25 +88,31 @@ def save_metadata(doi, data):
         json.dump(data, f, indent=2, ensure_ascii=False)
 
 
-if __name__ == "__main__":
-    dois = [
-"10.1016/j.jaap.2012.06.009"
-    ]
+def process_doi(doi):
+    data = fetch_crossref(doi)
 
-    for doi in tqdm(dois, desc="Fetching"):
-        data = fetch_crossref(doi)
+    if data is None:
+        logging.error(f"❌ Failed metadata: {doi}")
+        return False
 
-        if data is None:
-            logging.error(f"❌ Failed metadata: {doi}")
-            continue
+    msg = data.get("message", {})
+    title = extract_title(msg)
 
-        msg = data.get("message", {})
-        title = extract_title(msg)
+    logging.info(f"Title: {title}")
 
-        logging.info(f"Title: {title}")
+    # 🔥 전체 메타데이터 저장
+    save_metadata(doi, msg)
+    logging.info(f"Saved metadata → meta_{doi.replace('/', '_')}.json")
+    return True
 
-        # 🔥 전체 메타데이터 저장
-        save_metadata(doi, msg)
-        logging.info(f"Saved metadata → meta_{doi.replace('/', '_')}.json")
 
+if __name__ == "__main__":
+    dois = [
+"10.1016/j.jaap.2012.06.009"
+    ]
 
+    # 네트워크 대기가 대부분이라 DOI 들을 thread 로 동시에 요청 (SESSION pool 크기만큼)
+    with ThreadPoolExecutor(max_workers=16) as ex:
+        futures = [ex.submit(process_doi, doi) for doi in dois]
+        for fut in tqdm(as_completed(futures), total=len(futures), desc="Fetching"):
+            fut.result()
@@ -23,20 +23,16 @@ def prepend_cuda(input_file, output_file, cuda_id):
     logging.info(f"Reading: {input_file}")
     logging.info(f"CUDA_VISIBLE_DEVICES={cuda_id}")
 
-    with open(input_file, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    new_lines = []
-    for line in tqdm(lines, desc="Processing commands"):
-        stripped = line.strip()
-        if stripped == "":
-            new_lines.append("\n")
-            continue
-
-        new_lines.append(f"CUDA_VISIBLE_DEVICES={cuda_id} {stripped}\n")
-
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.writelines(new_lines)
+    # 한 줄씩 읽고 바로 쓰기 (file 전체를 메모리에 올리지 않음)
+    with open(input_file, "r", encoding="utf-8") as fin, \
+            open(output_file, "w", encoding="utf-8") as fout:
+        for line in tqdm(fin, desc="Processing commands", mininterval=1.0, miniters=1000, smoothing=0):
+            stripped = line.strip()
+            if stripped == "":
+                fout.write("\n")
+                continue
+
+            fout.write(f"CUDA_VISIBLE_DEVICES={cuda_id} {stripped}\n")
 
     logging.info(f"Saved updated script → {output_file}")
 
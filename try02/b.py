@@ -1,11 +1,16 @@
 import requests
+from requests.adapters import HTTPAdapter
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
+# DOI 마다 새 TCP+TLS 연결을 맺지 않도록 keep-alive session 재사용
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0))
+
 def fetch_semantic(doi):
     url = f"https://api.semanticscholar.org/graph/v1/paper/DOI:{doi}?fields=title,abstract,authors,year,venue"
-    r = requests.get(url, timeout=10)
+    r = SESSION.get(url, timeout=10)
 
     if r.status_code != 200:
         logging.error(f"Failed: {doi}")
@@ -14,7 +14,11 @@ params = {
     "count": 25
 }
 
-r = requests.get(url, headers=headers, params=params)
+# 같은 session 으로 요청 (여러 query 를 보낼 때 연결 재사용)
+SESSION = requests.Session()
+SESSION.headers.update(headers)
+
+r = SESSION.get(url, params=params)
 print(r.status_code)
 print(r.json())
 
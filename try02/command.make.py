@@ -7,28 +7,21 @@ OUTPUT_FILE = "marker_commands.sh"    # 생성할 실행 스크립트
 
 os.makedirs(OUTPUT_ROOT, exist_ok=True)
 
-# PDF 목록 가져오기
-pdf_files = sorted([
-    f for f in os.listdir(INPUT_DIR)
-    if f.lower().endswith(".pdf")
-])
-
+# PDF 목록 가져오기 (scandir → DirEntry.name 을 바로 사용)
+with os.scandir(INPUT_DIR) as it:
+    pdf_files = sorted(e.name for e in it if e.name.lower().endswith(".pdf"))
+
+# 커맨드 생성 (output_dir = 파일명에서 ".pdf" 4글자 제거)
+cmds = [
+    f'marker_single "{INPUT_DIR}/{pdf}" '
+    f'--output_dir "{OUTPUT_ROOT}/{pdf[:-4]}" '
+    f'--output_format markdown\n'
+    for pdf in pdf_files
+]
+
+# 한 번에 기록
 with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-    for pdf in pdf_files:
-        input_path = os.path.join(INPUT_DIR, pdf)
-
-        # output_dir = 파일명(확장자 제거)
-        pdf_name = os.path.splitext(pdf)[0]
-        output_dir = os.path.join(OUTPUT_ROOT, pdf_name)
-
-        # 커맨드 생성
-        cmd = (
-            f'marker_single "{input_path}" '
-            f'--output_dir "{output_dir}" '
-            f'--output_format markdown\n'
-        )
-
-        f.write(cmd)
+    f.writelines(cmds)
 
 print(f"Generated {len(pdf_files)} commands → {OUTPUT_FILE}")
 
@@ -8,6 +8,7 @@ Creates:
 """
 
 import os
+import mmap
 import logging
 from tqdm import tqdm
 
@@ -21,6 +22,41 @@ logging.basicConfig(
 )
 
 
+def _line_offsets(mm, part_sizes):
+    """byte offset at which each part ends (memchr 로 \n 만 찾음 → line decode X)"""
+    offsets = []
+    pos = 0
+    for p_size in part_sizes:
+        for _ in range(p_size):
+            nl = mm.find(b"\n", pos)
+            pos = len(mm) if nl == -1 else nl + 1
+        offsets.append(pos)
+    return offsets
+
+
+def _copy_range(src, dst, offset, length):
+    # kernel 안에서 바로 복사 (user space buffer 를 거치지 않음)
+    try:
+        while length > 0:
+            sent = os.sendfile(dst.fileno(), src.fileno(), offset, length)
+            if sent == 0:
+                break
+            offset += sent
+            length -= sent
+        return
+    except (AttributeError, OSError):
+        pass
+
+    # sendfile 이 없는 platform → 1 MiB buffer 로 복사
+    src.seek(offset)
+    while length > 0:
+        buf = src.read(min(length, 1 << 20))
+        if not buf:
+            break
+        dst.write(buf)
+        length -= len(buf)
+
+
 def split_into_three(file_path):
     if not os.path.isfile(file_path):
         logging.error(f"File not found: {file_path}")
@@ -28,39 +64,46 @@ def split_into_three(file_path):
 
     logging.info(f"Loading file: {file_path}")
 
-    # Read lines
-    with open(file_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    total = len(lines)
-    logging.info(f"Total lines: {total}")
-
-    # Determine chunk sizes
-    size = total // 3
-    remain = total % 3
-
-    # Compute exact split indices
-    part_sizes = [size, size, size]
-    for i in range(remain):
-        part_sizes[i] += 1
-
-    logging.info(f"Part sizes: {part_sizes}")
-
-    parts = []
-    start = 0
-    for p_size in part_sizes:
-        end = start + p_size
-        parts.append(lines[start:end])
-        start = end
-
     # Save parts
     base = os.path.splitext(file_path)[0]
 
-    for idx, content in enumerate(tqdm(parts, desc="Writing parts")):
-        out_name = f"{base}.part{idx+1}.sh"
-        with open(out_name, "w", encoding="utf-8") as f:
-            f.writelines(content)
-        logging.info(f"Created: {out_name} ({len(content)} lines)")
+    with open(file_path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if file_size else b""
+
+        # count lines (마지막 줄에 \n 이 없어도 한 줄로 셈)
+        total = 0
+        pos = mm.find(b"\n")
+        while pos != -1:
+            total += 1
+            pos = mm.find(b"\n", pos + 1)
+        if file_size and mm[-1:] != b"\n":
+            total += 1
+        logging.info(f"Total lines: {total}")
+
+        # Determine chunk sizes
+        size = total // 3
+        remain = total % 3
+
+        # Compute exact split indices
+        part_sizes = [size, size, size]
+        for i in range(remain):
+            part_sizes[i] += 1
+
+        logging.info(f"Part sizes: {part_sizes}")
+
+        # line 경계의 byte offset 만 계산하고, 내용은 byte 범위 그대로 복사
+        ends = _line_offsets(mm, part_sizes)
+        if file_size:
+            mm.close()
+
+        start = 0
+        for idx, end in enumerate(tqdm(ends, desc="Writing parts")):
+            out_name = f"{base}.part{idx+1}.sh"
+            with open(out_name, "wb") as out:
+                _copy_range(f, out, start, end - start)
+            logging.info(f"Created: {out_name} ({part_sizes[idx]} lines)")
+            start = end
 
 
 if __name__ == "__main__":
@@ -10,98 +10,106 @@ import os
 import json
 import csv
 import logging
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from tqdm import tqdm
 
+# orjson 이 있으면 사용 (Rust parser, bytes 를 바로 받음), 없으면 stdlib json
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s | %(levelname)s | %(message)s"
 )
 
 
-def scan_results(root_folder):
-    """
-    qwen_results_test 내부 폴더들을 순회하며
-    input.txt + result.json 을 파싱.
-    폴더 이름(~.xml)을 source_file 로 저장.
-    """
-    data = []
+# CSV 한 줄 (field 이름이 그대로 CSV header)
+Row = namedtuple("Row", "source_file abstract label reason")
 
-    subfolders = [
-        os.path.join(root_folder, d)
-        for d in os.listdir(root_folder)
-        if os.path.isdir(os.path.join(root_folder, d))
-    ]
 
-    for folder in tqdm(subfolders, desc="Scanning result folders"):
-        source_file = os.path.basename(folder)  # e.g., 000862159380027C__META_ABS.xml
-        input_path = os.path.join(folder, "input.txt")
-        result_path = os.path.join(folder, "result.json")
+def _parse_one(folder):
+    """서브폴더 하나의 input.txt + result.json 을 파싱 (스킵/실패 시 None)"""
+    source_file = os.path.basename(folder)  # e.g., 000862159380027C__META_ABS.xml
+    input_path = os.path.join(folder, "input.txt")
+    result_path = os.path.join(folder, "result.json")
 
-        if not os.path.exists(input_path) or not os.path.exists(result_path):
-            continue
+    # 두 파일 존재 여부를 readdir 한 번으로 확인 (stat 두 번 X)
+    with os.scandir(folder) as it:
+        names = {e.name for e in it}
+    if "input.txt" not in names or "result.json" not in names:
+        return None
 
-        try:
-            with open(input_path, "r", encoding="utf-8") as f:
-                abstract = f.read().strip()
+    try:
+        with open(input_path, "r", encoding="utf-8") as f:
+            abstract = f.read().strip()
 
-            with open(result_path, "r", encoding="utf-8") as f:
-                result = json.load(f)
+        with open(result_path, "rb") as f:
+            result = json_loads(f.read())
 
-            label = result.get("pyrolysis_related", "")
-            reason = result.get("reason", "")
+        label = result.get("pyrolysis_related", "")
+        reason = result.get("reason", "")
 
-            data.append({
-                "source_file": source_file,
-                "abstract": abstract,
-                "label": label,
-                "reason": reason
-            })
+        return Row(source_file, abstract, label, reason)
 
-        except Exception as e:
-            logging.error(f"Error reading {folder}: {e}")
-            continue
+    except Exception as e:
+        logging.error(f"Error reading {folder}: {e}")
+        return None
 
-    return data
 
+def iter_results(root_folder, max_workers=32):
+    """
+    qwen_results_test 내부 폴더들을 순회하며
+    input.txt + result.json 을 파싱해서 row tuple 을 하나씩 yield (list 로 모으지 않음).
+    폴더 이름(~.xml)을 source_file 로 저장.
+    폴더 단위 I/O 가 서로 독립적이라 thread pool 로 동시에 읽음.
+    """
+    # scandir 는 dirent 의 type 을 그대로 사용 → entry 마다 stat() 추가 호출 X
+    with os.scandir(root_folder) as it:
+        subfolders = [e.path for e in it if e.is_dir(follow_symlinks=False)]
 
-def save_all_to_csv(data, csv_path="all_results.csv"):
+    with ThreadPoolExecutor(max_workers=max_workers) as ex:
+        for rec in tqdm(ex.map(_parse_one, subfolders), total=len(subfolders),
+                        desc="Scanning result folders",
+                        mininterval=1.0, miniters=1000, smoothing=0):
+            if rec:
+                yield rec
+
+
+def save_all_to_csv(rows, csv_path="all_results.csv"):
+    """scan 되는 대로 한 줄씩 기록하면서 YES/NO 도 같은 pass 에서 count → (yes, no, total)"""
     logging.info(f"Saving ALL entries (YES + NO) to CSV: {csv_path}")
 
-    with open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
-        writer = csv.writer(f)
-        writer.writerow(["source_file", "abstract", "label", "reason"])
+    # writerows 에 넘기는 동안 label 을 count (row loop 는 _csv (C) 안에서)
+    labels = Counter()
 
-        for d in data:
-            writer.writerow([
-                d["source_file"],
-                d["abstract"],
-                d["label"],
-                d["reason"]
-            ])
+    def tally(rows):
+        for row in rows:
+            labels[row.label] += 1
+            yield row
 
-    logging.info(f"Saved {len(data)} rows to {csv_path}")
+    with open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        writer.writerow(Row._fields)
 
+        writer.writerows(tally(rows))
 
-def count_yes_no(data):
-    yes = sum(1 for d in data if d["label"] == "YES")
-    no = sum(1 for d in data if d["label"] == "NO")
-    total = yes + no
-    return yes, no, total
+    logging.info(f"Saved {sum(labels.values())} rows to {csv_path}")
+    return labels["YES"], labels["NO"], labels["YES"] + labels["NO"]
 
 
 if __name__ == "__main__":
     ROOT = "qwen_results_v2"
 
     logging.info("Starting scan...")
-    parsed = scan_results(ROOT)
-
-    yes, no, total = count_yes_no(parsed)
+    yes, no, total = save_all_to_csv(iter_results(ROOT), "all_results.csv")
 
     print("\n===== SUMMARY =====")
     print(f"YES: {yes}")
     print(f"NO: {no}")
     print(f"TOTAL: {total}")
 
-    save_all_to_csv(parsed, "all_results.csv")
     print("\nCSV saved: all_results.csv")
-
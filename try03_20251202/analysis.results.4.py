@@ -8,119 +8,116 @@ import os
 import json
 import csv
 import logging
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from tqdm import tqdm
 
+# orjson (Rust parser, takes bytes directly) when available, else stdlib json
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s | %(levelname)s | %(message)s"
 )
 
 
-def scan_results(root_folder):
-    """
-    Scan result folders such as:
-      root/source_file_folder/
-         - input.txt
-         - result.json
-    Return list of dict containing parsed info.
-    """
-    data = []
+# One CSV row; field names double as the CSV header
+Row = namedtuple("Row", "source_file abstract pyrolysis_related include_in_oil_db reason flags")
 
-    subfolders = [
-        os.path.join(root_folder, d)
-        for d in os.listdir(root_folder)
-        if os.path.isdir(os.path.join(root_folder, d))
-    ]
 
-    for folder in tqdm(subfolders, desc="Scanning result folders"):
-        source_file = os.path.basename(folder)
-        input_path = os.path.join(folder, "input.txt")
-        result_path = os.path.join(folder, "result.json")
+def _parse_one(folder):
+    """Parse input.txt + result.json of one result folder (None if skipped/failed)."""
+    source_file = os.path.basename(folder)
+    input_path = os.path.join(folder, "input.txt")
+    result_path = os.path.join(folder, "result.json")
 
-        if not (os.path.exists(input_path) and os.path.exists(result_path)):
-            continue
+    # one readdir for both files instead of two stat() calls
+    with os.scandir(folder) as it:
+        names = {e.name for e in it}
+    if "input.txt" not in names or "result.json" not in names:
+        return None
 
-        try:
-            with open(input_path, "r", encoding="utf-8") as f:
-                abstract = f.read().strip()
+    try:
+        with open(input_path, "r", encoding="utf-8") as f:
+            abstract = f.read().strip()
 
-            with open(result_path, "r", encoding="utf-8") as f:
-                result = json.load(f)
+        with open(result_path, "rb") as f:
+            result = json_loads(f.read())
 
-            pyro = result.get("pyrolysis_related", "")
-            include = result.get("include_in_oil_db", "")
-            reason = result.get("reason", "")
-            flags = result.get("flags", [])
+        pyro = result.get("pyrolysis_related", "")
+        include = result.get("include_in_oil_db", "")
+        reason = result.get("reason", "")
+        flags = result.get("flags", [])
 
-            # flags must be list, convert safely
-            if isinstance(flags, list):
-                flags_str = ";".join(flags)
-            else:
-                flags_str = str(flags)
+        # flags must be list, convert safely
+        if isinstance(flags, list):
+            flags_str = ";".join(flags)
+        else:
+            flags_str = str(flags)
 
-            data.append({
-                "source_file": source_file,
-                "abstract": abstract,
-                "pyrolysis_related": pyro,
-                "include_in_oil_db": include,
-                "reason": reason,
-                "flags": flags_str
-            })
+        return Row(source_file, abstract, pyro, include, reason, flags_str)
 
-        except Exception as e:
-            logging.error(f"Error reading {folder}: {e}")
-            continue
+    except Exception as e:
+        logging.error(f"Error reading {folder}: {e}")
+        return None
 
-    return data
 
+def iter_results(root_folder, max_workers=None):
+    """
+    Scan result folders such as:
+      root/source_file_folder/
+         - input.txt
+         - result.json
+    Yield one row tuple per parsed folder (nothing is accumulated in memory).
+    Folders are parsed in a process pool so json parsing is not serialized by the GIL.
+    """
+    # scandir reuses the dirent type -> no extra stat() per entry
+    with os.scandir(root_folder) as it:
+        subfolders = [e.path for e in it if e.is_dir(follow_symlinks=False)]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as ex:
+        for rec in tqdm(ex.map(_parse_one, subfolders, chunksize=64), total=len(subfolders),
+                        desc="Scanning result folders",
+                        mininterval=1.0, miniters=1000, smoothing=0):
+            if rec:
+                yield rec
 
-def save_all_to_csv(data, csv_path="all_results.csv"):
+
+def save_all_to_csv(rows, csv_path="all_results.csv"):
+    """Write rows as they are scanned and count labels in the same pass -> (yes, no, total)"""
     logging.info(f"Saving ALL entries (YES + NO) to CSV: {csv_path}")
 
+    # count labels while the rows pass through to writerows (row loop stays inside _csv)
+    labels = Counter()
+
+    def tally(rows):
+        for row in rows:
+            labels[row.pyrolysis_related] += 1
+            yield row
+
     with open(csv_path, "w", newline="", encoding="utf-8-sig") as f:
         writer = csv.writer(f)
-        writer.writerow([
-            "source_file",
-            "abstract",
-            "pyrolysis_related",
-            "include_in_oil_db",
-            "reason",
-            "flags"
-        ])
-
-        for d in data:
-            writer.writerow([
-                d["source_file"],
-                d["abstract"],
-                d["pyrolysis_related"],
-                d["include_in_oil_db"],
-                d["reason"],
-                d["flags"]
-            ])
-
-    logging.info(f"Saved {len(data)} rows to {csv_path}")
-
-
-def count_yes_no(data):
-    yes = sum(1 for d in data if d["pyrolysis_related"] == "YES")
-    no = sum(1 for d in data if d["pyrolysis_related"] == "NO")
-    total = yes + no
-    return yes, no, total
+        writer.writerow(Row._fields)
+
+        writer.writerows(tally(rows))
+
+    logging.info(f"Saved {sum(labels.values())} rows to {csv_path}")
+    return labels["YES"], labels["NO"], labels["YES"] + labels["NO"]
 
 
 if __name__ == "__main__":
     ROOT = "qwen_results_v2"
 
     logging.info("Starting scan...")
-    parsed = scan_results(ROOT)
-
-    yes, no, total = count_yes_no(parsed)
+    yes, no, total = save_all_to_csv(iter_results(ROOT), "all_results.csv")
 
     print("\n===== SUMMARY =====")
     print(f"pyrolysis_related = YES: {yes}")
     print(f"pyrolysis_related = NO : {no}")
     print(f"TOTAL: {total}")
 
-    save_all_to_csv(parsed, "all_results.csv")
     print("\nCSV saved: all_results.csv")
-
@@ -1,32 +1,44 @@
 # -*- coding: utf-8 -*-
 """
 YES/NO ratio counter for results.txt
-Includes logging + tqdm
+Includes logging
 """
 
 import logging
-from tqdm import tqdm
+import mmap
+import os
 
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s | %(levelname)s | %(message)s"
 )
 
+YES_NEEDLE = b'"pyrolysis_related": "YES"'
+NO_NEEDLE = b'"pyrolysis_related": "NO"'
+
+
+def count_needle(mm, needle):
+    """mmap 안에서 needle 개수 (mmap.find 는 C memmem → 매치 사이 구간은 Python 을 거치지 않음)"""
+    n = 0
+    pos = mm.find(needle)
+    while pos != -1:
+        n += 1
+        pos = mm.find(needle, pos + len(needle))
+    return n
+
+
 def count_yes_no(filepath):
     yes = 0
     no = 0
 
     logging.info(f"Reading file: {filepath}")
 
-    with open(filepath, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-
-    for line in tqdm(lines, desc="Processing lines"):
-        line = line.strip()
-        if '"pyrolysis_related": "YES"' in line:
-            yes += 1
-        elif '"pyrolysis_related": "NO"' in line:
-            no += 1
+    # 파일 전체를 mmap 해서 needle 을 바로 scan (readlines + line 단위 Python loop X)
+    with open(filepath, "rb") as f:
+        if os.fstat(f.fileno()).st_size > 0:   # 빈 파일은 mmap 불가
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yes = count_needle(mm, YES_NEEDLE)
+                no = count_needle(mm, NO_NEEDLE)
 
     total = yes + no
     ratio_yes = yes / total * 100 if total > 0 else 0
@@ -8,19 +8,31 @@ CSV Batch Ollama Classifier
 - 결과는 source_file 이름으로 폴더 생성 후 저장
 - all.log + fail.log 동시에 기록
 - tqdm + logging
+- asyncio 로 여러 row 를 동시에 요청 (OLLAMA_NUM_PARALLEL 과 함께 사용)
 """
 
 import argparse
+import asyncio
+import json
 import logging
-import subprocess
 from datetime import datetime
+from functools import lru_cache
 from tqdm import tqdm
 import os
 import sys
-import shutil
+import threading
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
 import re
 
+# orjson 이 있으면 사용 (Rust parser, bytes 를 바로 받음), 없으면 stdlib json
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
 # ------------------------------------------------------------
 # Logging
 # ------------------------------------------------------------
@@ -45,42 +57,182 @@ fail_logger.setLevel(logging.INFO)
 # ------------------------------------------------------------
 # Ollama runner
 # ------------------------------------------------------------
-def run_ollama(model: str, full_prompt: str) -> str:
-    cmd = [
-        "ollama",
-        "run",
-        model,
-        "--format",
-        "json",
-    ]
-
-    process = subprocess.Popen(
-        cmd,
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,
-    )
+OLLAMA_URL = "http://localhost:11434/api/generate"
+_SESSION = requests.Session()
+# 동시 요청 수만큼 connection pool 확보
+_SESSION.mount("http://", HTTPAdapter(pool_maxsize=32))
 
-    out, err = process.communicate(full_prompt)
 
-    if err:
-        err_str = err.strip()
-        if err_str:
-            logging.warning(f"Ollama STDERR: {err_str}")
+def run_ollama(model: str, full_prompt: str) -> str:
+    # 같은 session 으로 HTTP API 호출 (row 마다 `ollama run` 프로세스 생성 X)
+    resp = _SESSION.post(
+        OLLAMA_URL,
+        json={
+            "model": model,
+            "prompt": full_prompt,
+            "stream": False,
+            "keep_alive": "30m",   # row 사이에 모델을 VRAM 에 유지
+            "format": "json",
+        },
+        timeout=600,
+    )
+    resp.raise_for_status()
 
+    out = resp.json().get("response", "")
     return out.strip() if out else ""
 
 
 # ------------------------------------------------------------
 # Safe folder name
 # ------------------------------------------------------------
+# pattern 은 module load 시 한 번만 compile
+_UNSAFE_CHARS = re.compile(r"[^\w\-.]")
+
+
+@lru_cache(maxsize=65536)
 def safe_folder_name(name: str) -> str:
-    name = str(name)
-    name = name.strip()
     # 위험 문자는 전부 _ 로 치환
-    name = re.sub(r"[^\w\-.]", "_", name)
-    return name
+    return _UNSAFE_CHARS.sub("_", str(name).strip())
+
+
+# ------------------------------------------------------------
+# Output folders
+# ------------------------------------------------------------
+_MADE_DIRS = set()
+
+
+def ensure_dir(path: str):
+    # 이번 run 에서 이미 만든 폴더는 다시 makedirs (stat syscall) 하지 않음
+    if path not in _MADE_DIRS:
+        os.makedirs(path, exist_ok=True)
+        _MADE_DIRS.add(path)
+
+
+# 같은 폴더에 쓰는 row 끼리 직렬화용 lock (폴더마다 하나)
+_DIR_LOCKS = {}
+_DIR_LOCKS_LOCK = threading.Lock()
+
+
+def dir_lock(path: str) -> threading.Lock:
+    with _DIR_LOCKS_LOCK:
+        lock = _DIR_LOCKS.get(path)
+        if lock is None:
+            lock = _DIR_LOCKS[path] = threading.Lock()
+        return lock
+
+
+# ------------------------------------------------------------
+# Resume check
+# ------------------------------------------------------------
+def has_result(result_path: str) -> bool:
+    # result.json 이 있고, 비어있지 않고, JSON 으로 parse 되면 완료된 row
+    try:
+        with open(result_path, "rb") as f:
+            json_loads(f.read())
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+# ------------------------------------------------------------
+# Prompt template copy
+# ------------------------------------------------------------
+def link_template(ref_path: str, dst_path: str, template_bytes: bytes):
+    # outdir 의 reference copy 를 hardlink (row 마다 prompt 파일을 다시 읽고 복사 X)
+    try:
+        if os.path.lexists(dst_path):
+            os.remove(dst_path)
+        os.link(ref_path, dst_path)
+    except OSError:
+        # hardlink 불가 (다른 device / 지원 X filesystem) → 메모리의 bytes 를 그냥 쓰기
+        with open(dst_path, "wb") as f:
+            f.write(template_bytes)
+
+
+# ------------------------------------------------------------
+# Per-row processing
+# ------------------------------------------------------------
+def process_row(idx, abstract_text, source_name_raw, args, prompt_pre, prompt_post, template_bytes):
+    source_name = safe_folder_name(source_name_raw)
+
+    # Use source_file as folder name
+    run_dir = os.path.join(args.outdir, source_name)
+    result_path = os.path.join(run_dir, "result.json")
+
+    # --resume: 이미 정상 result.json 이 있는 row 는 모델 호출 없이 건너뜀
+    if args.resume and has_result(result_path):
+        logging.info(f"[Row {idx}] SKIP (resume) → {run_dir}")
+        return
+
+    ensure_dir(run_dir)
+
+    # Build prompt
+    full_prompt = prompt_pre + abstract_text + prompt_post
+
+    try:
+        result = run_ollama(args.model, full_prompt)
+
+        # 같은 source_file 의 row 들이 같은 폴더를 씀 → 폴더 단위 lock 안에서 한 row 의 파일들을 한꺼번에 기록
+        # (result.json 은 한 row, input.txt 는 다른 row 인 상태로 섞이지 않게)
+        with dir_lock(run_dir):
+            # Save result.json (tmp 에 쓰고 rename → 중단되어도 반쯤 쓴 파일이 완료로 보이지 않음)
+            tmp_path = f"{result_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(result)
+            os.replace(tmp_path, result_path)
+
+            # Save used prompt
+            with open(os.path.join(run_dir, "prompt_used.txt"), "w", encoding="utf-8") as f:
+                f.write(full_prompt)
+
+            # Save abstract input
+            with open(os.path.join(run_dir, "input.txt"), "w", encoding="utf-8") as f:
+                f.write(abstract_text)
+
+            # Save original prompt copy
+            link_template(
+                os.path.join(args.outdir, "prompt_template.txt"),
+                os.path.join(run_dir, "prompt_template.txt"),
+                template_bytes,
+            )
+
+        logging.info(f"[Row {idx}] OK → {run_dir}")
+
+        # JSON 구조 sanity check (약식)
+        if not result or "pyrolysis_related" not in result:
+            fail_logger.info(f"{source_name_raw} | Missing 'pyrolysis_related' in JSON")
+
+    except Exception as e:
+        fail_logger.info(f"{source_name_raw} | ERROR: {str(e)}")
+        logging.error(f"Failed: {source_name_raw} | {e}")
+
+
+async def process_all(df, args, prompt_pre, prompt_post, template_bytes, use_title_abstract):
+    sem = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(idx, abstract_text, source_name_raw):
+        async with sem:
+            # HTTP 호출 + 파일 쓰기는 blocking 이므로 worker thread 에서 실행
+            await asyncio.to_thread(
+                process_row, idx, abstract_text, source_name_raw, args,
+                prompt_pre, prompt_post, template_bytes,
+            )
+
+    # itertuples(name=None) → 필요한 컬럼만 plain tuple 로 (row 마다 Series 생성 X)
+    tasks = []
+    if use_title_abstract:
+        cols = df[[args.title_col, args.abstract_col, args.sf_col]]
+        for idx, title, abstract, source_name_raw in cols.itertuples(name=None):
+            # 입력 텍스트 구성
+            abstract_text = f"Title: {str(title).strip()}\nAbstract: {str(abstract).strip()}"
+            tasks.append(bounded(idx, abstract_text, str(source_name_raw)))
+    else:
+        cols = df[[args.text_col, args.sf_col]]
+        for idx, text, source_name_raw in cols.itertuples(name=None):
+            tasks.append(bounded(idx, str(text).strip(), str(source_name_raw)))
+
+    for fut in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Processing rows", unit="row"):
+        await fut
 
 
 # ------------------------------------------------------------
@@ -127,25 +279,35 @@ def main():
         default=None,
         help="Process only N rows for testing (optional)",
     )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip rows whose result.json already exists and is valid JSON",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=4,
+        help="Concurrent requests (single GPU: 2-4, start Ollama with OLLAMA_NUM_PARALLEL >= this)",
+    )
 
     args = parser.parse_args()
 
-    # Load CSV
-    logging.info(f"Loading CSV: {args.csv}")
-    df = pd.read_csv(args.csv)
+    # header 만 먼저 읽어서 컬럼 체크 (본문은 필요한 컬럼만 나중에 load)
+    columns = pd.read_csv(args.csv, nrows=0).columns
 
     # 기본 컬럼 체크
-    if args.sf_col not in df.columns:
+    if args.sf_col not in columns:
         logging.error(f"Column '{args.sf_col}' not found in CSV!")
         return
 
     # title/abstract 사용 여부 결정
     use_title_abstract = False
     if args.title_col and args.abstract_col:
-        if args.title_col not in df.columns:
+        if args.title_col not in columns:
             logging.error(f"Column '{args.title_col}' not found in CSV!")
             return
-        if args.abstract_col not in df.columns:
+        if args.abstract_col not in columns:
             logging.error(f"Column '{args.abstract_col}' not found in CSV!")
             return
         use_title_abstract = True
@@ -154,23 +316,39 @@ def main():
         )
     else:
         # fallback: text_col 사용
-        if args.text_col not in df.columns:
+        if args.text_col not in columns:
             logging.error(
                 f"Column '{args.text_col}' not found in CSV and no title/abstract columns provided!"
             )
             return
         logging.info(f"Using text column: text_col='{args.text_col}'")
 
+    # Load CSV (사용하는 컬럼만 parse → 나머지 컬럼의 문자열 object 는 만들지 않음)
+    if use_title_abstract:
+        needed = [args.sf_col, args.title_col, args.abstract_col]
+    else:
+        needed = [args.sf_col, args.text_col]
+    logging.info(f"Loading CSV: {args.csv} (columns: {needed})")
+    df = pd.read_csv(args.csv, usecols=needed, nrows=args.limit)
+
     if args.limit:
-        df = df.head(args.limit)
         logging.info(f"Row limit set: {args.limit}, processing first {len(df)} rows")
 
     os.makedirs(args.outdir, exist_ok=True)
 
     # Load prompt
     logging.info(f"Loading prompt: {args.prompt}")
-    with open(args.prompt, "r", encoding="utf-8") as f:
-        prompt_template = f.read()
+    with open(args.prompt, "rb") as f:
+        template_bytes = f.read()   # row 마다 prompt 파일을 다시 읽지 않도록 한 번만 읽음
+    prompt_template = template_bytes.decode("utf-8")
+
+    # 모든 run 폴더가 hardlink 할 reference copy (outdir 에 한 번만 기록)
+    # 새 inode 로 교체해야 이전 run 폴더의 hardlink 내용이 바뀌지 않음 → tmp + os.replace
+    ref_path = os.path.join(args.outdir, "prompt_template.txt")
+    tmp_path = f"{ref_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(template_bytes)
+    os.replace(tmp_path, ref_path)
 
     # placeholder 확인 및 추가
     if "<<<ABSTRACT>>>" not in prompt_template:
@@ -179,56 +357,11 @@ def main():
         )
         prompt_template = prompt_template.rstrip() + "\n\n<<<ABSTRACT>>>"
 
-    # Process rows
-    for idx, row in tqdm(
-        df.iterrows(), total=len(df), desc="Processing rows", unit="row"
-    ):
-        # 입력 텍스트 구성
-        if use_title_abstract:
-            title = str(row[args.title_col]).strip()
-            abstract = str(row[args.abstract_col]).strip()
-            abstract_text = f"Title: {title}\nAbstract: {abstract}"
-        else:
-            abstract_text = str(row[args.text_col]).strip()
-
-        source_name_raw = str(row[args.sf_col])
-        source_name = safe_folder_name(source_name_raw)
-
-        # Use source_file as folder name
-        run_dir = os.path.join(args.outdir, source_name)
-        os.makedirs(run_dir, exist_ok=True)
-
-        # Build prompt
-        full_prompt = prompt_template.replace("<<<ABSTRACT>>>", abstract_text)
-
-        try:
-            result = run_ollama(args.model, full_prompt)
-
-            # Save result.json
-            result_path = os.path.join(run_dir, "result.json")
-            with open(result_path, "w", encoding="utf-8") as f:
-                f.write(result)
-
-            # Save used prompt
-            with open(os.path.join(run_dir, "prompt_used.txt"), "w", encoding="utf-8") as f:
-                f.write(full_prompt)
-
-            # Save abstract input
-            with open(os.path.join(run_dir, "input.txt"), "w", encoding="utf-8") as f:
-                f.write(abstract_text)
-
-            # Save original prompt copy
-            shutil.copy(args.prompt, os.path.join(run_dir, "prompt_template.txt"))
-
-            logging.info(f"[Row {idx}] OK → {run_dir}")
-
-            # JSON 구조 sanity check (약식)
-            if not result or "pyrolysis_related" not in result:
-                fail_logger.info(f"{source_name_raw} | Missing 'pyrolysis_related' in JSON")
+    # placeholder 기준으로 한 번만 나눔 → row 마다 template 전체를 scan 하지 않음
+    prompt_pre, _, prompt_post = prompt_template.partition("<<<ABSTRACT>>>")
 
-        except Exception as e:
-            fail_logger.info(f"{source_name_raw} | ERROR: {str(e)}")
-            logging.error(f"Failed: {source_name_raw} | {e}")
+    # Process rows (동시에 최대 --concurrency 개 요청 → Ollama 서버에서 batching)
+    asyncio.run(process_all(df, args, prompt_pre, prompt_post, template_bytes, use_title_abstract))
 
     logging.info("All rows processed.")
 
@@ -5,7 +5,7 @@
 Streamlit viewer for QWEN plastic pyrolysis classification results
 ==================================================================
 
-- Reads: all_results.csv
+- Reads: all_results.csv (via an all_results.parquet copy when pyarrow is installed)
 - Shows one paper at a time with navigation (prev/next/random/index)
 - Filters by:
     - pyrolysis_related (YES/NO)
@@ -25,19 +25,28 @@ Streamlit viewer for QWEN plastic pyrolysis classification results
 """
 
 import os
+import csv
+import random
 import logging
 from datetime import datetime
-from collections import Counter
 
+import numpy as np
 import pandas as pd
-from tqdm import tqdm
 import streamlit as st
 
+# pyarrow is pandas' Parquet engine; without it we just read the CSV every time
+try:
+    import pyarrow  # noqa: F401
+    HAS_PARQUET = True
+except ImportError:
+    HAS_PARQUET = False
+
 
 # ============================================================
 # Paths
 # ============================================================
 ALL_RESULTS_CSV = "all_results.csv"
+ALL_RESULTS_PARQUET = "all_results.parquet"   # columnar copy of ALL_RESULTS_CSV
 REVIEW_RESULTS_CSV = "review_results.csv"
 LOG_FILE = "streamlit_qwen_review.log"
 
@@ -71,57 +80,98 @@ logger.info("=== Streamlit QWEN Review App started ===")
 # ============================================================
 # Data loading
 # ============================================================
-@st.cache_data
+# Columns the app uses; anything else in all_results.csv is never parsed
+REQUIRED_COLS = [
+    "source_file",
+    "abstract",
+    "pyrolysis_related",
+    "include_in_oil_db",
+    "reason",
+    "flags",
+]
+
+
+def read_results_table(csv_path: str, parquet_path: str = ALL_RESULTS_PARQUET) -> pd.DataFrame:
+    """
+    Read REQUIRED_COLS from the Parquet copy if it is newer than the CSV,
+    otherwise from the CSV (and refresh the Parquet copy for the next start).
+    """
+    if (
+        HAS_PARQUET
+        and os.path.exists(parquet_path)
+        and os.path.getmtime(parquet_path) >= os.path.getmtime(csv_path)
+    ):
+        logger.info(f"Reading {parquet_path}")
+        return pd.read_parquet(parquet_path, columns=REQUIRED_COLS)
+
+    df = pd.read_csv(csv_path, usecols=lambda c: c in REQUIRED_COLS)
+
+    if HAS_PARQUET and all(c in df.columns for c in REQUIRED_COLS):
+        tmp_path = f"{parquet_path}.{os.getpid()}.tmp"
+        try:
+            df.to_parquet(tmp_path, index=False, compression="zstd", row_group_size=65536)
+            os.replace(tmp_path, parquet_path)
+            logger.info(f"Wrote {parquet_path}")
+        except Exception:
+            logger.exception(f"Failed to write {parquet_path}; continuing with CSV")
+    return df
+
+
+# cache_resource keeps the live DataFrame (no pickle round-trip / copy per rerun);
+# callers treat it as read-only (main() only merges it into a new frame)
+@st.cache_resource(ttl=3600)
 def load_all_results(csv_path: str) -> pd.DataFrame:
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"{csv_path} not found in current directory.")
-    df = pd.read_csv(csv_path)
+    df = read_results_table(csv_path)
 
     # Ensure required cols exist; others can be extra
-    required_cols = [
-        "source_file",
-        "abstract",
-        "pyrolysis_related",
-        "include_in_oil_db",
-        "reason",
-        "flags",
-    ]
-    missing = [c for c in required_cols if c not in df.columns]
+    missing = [c for c in REQUIRED_COLS if c not in df.columns]
     if missing:
         raise ValueError(f"Missing required columns in all_results.csv: {missing}")
 
-    # Normalize flags text and parse into list
+    # Normalize flags text and parse into a set (built once; the filter only needs membership)
     df["flags"] = df["flags"].fillna("").astype(str)
-    df["flags_list"] = df["flags"].apply(
-        lambda x: [f.strip() for f in x.split(";") if f.strip()]
+    df["flags_set"] = df["flags"].map(
+        lambda x: frozenset(f.strip() for f in x.split(";") if f.strip())
     )
 
+    # Lower-cased copy of the abstract for the case-insensitive text search
+    df["abstract_lower"] = df["abstract"].fillna("").astype(str).str.lower()
+
     return df
 
 
-def load_review_results(csv_path: str) -> pd.DataFrame:
-    """Load or initialize review_results.csv (not cached; small file)."""
-    if not os.path.exists(csv_path):
-        cols = [
-            "source_file",
-            "pyrolysis_related_gold",
-            "include_in_oil_db_gold",
-            "review_comment",
-            "review_timestamp",
-        ]
-        return pd.DataFrame(columns=cols)
+REVIEW_COLS = [
+    "source_file",
+    "pyrolysis_related_gold",
+    "include_in_oil_db_gold",
+    "review_comment",
+    "review_timestamp",
+]
+
+
+@st.cache_data(max_entries=4)
+def _read_review_log(csv_path: str, mtime_ns: int, size: int) -> pd.DataFrame:
+    """Parse the review log; (mtime_ns, size) are only cache keys."""
     df = pd.read_csv(csv_path)
     # Ensure all expected columns exist
-    for col in [
-        "source_file",
-        "pyrolysis_related_gold",
-        "include_in_oil_db_gold",
-        "review_comment",
-        "review_timestamp",
-    ]:
+    for col in REVIEW_COLS:
         if col not in df.columns:
             df[col] = ""
-    return df
+    return df.drop_duplicates(subset="source_file", keep="last").reset_index(drop=True)
+
+
+def load_review_results(csv_path: str) -> pd.DataFrame:
+    """
+    Load or initialize review_results.csv.
+    The file is an append-only log, so keep only the latest row per source_file.
+    Re-parsed only when the file changes (stat key), not on every rerun.
+    """
+    if not os.path.exists(csv_path):
+        return pd.DataFrame(columns=REVIEW_COLS)
+    st_result = os.stat(csv_path)
+    return _read_review_log(csv_path, st_result.st_mtime_ns, st_result.st_size)
 
 
 def save_review_result(
@@ -131,46 +181,40 @@ def save_review_result(
     comment: str,
     csv_path: str = REVIEW_RESULTS_CSV,
 ):
-    """Insert or update a review row in review_results.csv."""
-    df_rev = load_review_results(csv_path)
-
+    """Append a review row to review_results.csv (a later row overrides earlier ones)."""
     timestamp = datetime.now().isoformat(timespec="seconds")
 
-    if source_file in df_rev["source_file"].values:
-        # Update existing row
-        idx = df_rev.index[df_rev["source_file"] == source_file][0]
-        df_rev.loc[idx, "pyrolysis_related_gold"] = pyro_gold
-        df_rev.loc[idx, "include_in_oil_db_gold"] = include_gold
-        df_rev.loc[idx, "review_comment"] = comment
-        df_rev.loc[idx, "review_timestamp"] = timestamp
-        logger.info(f"Updated review for {source_file}")
-    else:
-        # Append new row
-        new_row = {
-            "source_file": source_file,
-            "pyrolysis_related_gold": pyro_gold,
-            "include_in_oil_db_gold": include_gold,
-            "review_comment": comment,
-            "review_timestamp": timestamp,
-        }
-        df_rev = pd.concat([df_rev, pd.DataFrame([new_row])], ignore_index=True)
-        logger.info(f"Added new review for {source_file}")
-
-    df_rev.to_csv(csv_path, index=False, encoding="utf-8-sig")
+    # One appended line per save instead of re-reading and rewriting the whole file
+    write_header = not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+    with open(csv_path, "a", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f)
+        if write_header:
+            writer.writerow(REVIEW_COLS)
+        writer.writerow([source_file, pyro_gold, include_gold, comment, timestamp])
+
+    logger.info(f"Saved review for {source_file}")
 
 
 def build_flag_universe(df: pd.DataFrame) -> list[str]:
-    """Collect all unique flags across dataset (with tqdm for logging)."""
-    counter = Counter()
-    for text in tqdm(df["flags"], desc="Scanning flags for UI"):
-        parts = str(text).split(";")
-        for p in parts:
-            f = p.strip()
-            if f:
-                counter[f] += 1
+    """Collect all unique flags across dataset (split/strip/count stay in pandas)."""
+    parts = df["flags"].astype(str).str.split(";").explode().str.strip()
+    counts = parts[parts.ne("")].value_counts()
     # Sort by frequency (desc) then alphabetically
-    sorted_flags = sorted(counter.items(), key=lambda x: (-x[1], x[0]))
-    return [f for f, _ in sorted_flags]
+    counts = counts.sort_index().sort_values(ascending=False, kind="stable")
+    return counts.index.tolist()
+
+
+@st.cache_data(ttl=3600)
+def sidebar_options(csv_path: str) -> tuple[list, list, list[str]]:
+    """
+    Option lists for the sidebar filters, computed once per all_results file
+    (same path key and ttl as load_all_results, so widget reruns skip the scans
+    and the options refresh when the results table does).
+    """
+    df = load_all_results(csv_path)
+    pyro_options = sorted(df["pyrolysis_related"].dropna().unique().tolist())
+    include_options = sorted(df["include_in_oil_db"].dropna().unique().tolist())
+    return pyro_options, include_options, build_flag_universe(df)
 
 
 # ============================================================
@@ -258,8 +302,10 @@ def main():
         st.markdown("---")
         st.header("Filters")
 
+        # Option lists (and the flag universe) come from the cache, not a rescan per rerun
+        pyro_options, include_options, all_flags = sidebar_options(ALL_RESULTS_CSV)
+
         # Filter: pyrolysis_related
-        pyro_options = sorted(df["pyrolysis_related"].dropna().unique().tolist())
         pyro_selected = st.multiselect(
             "pyrolysis_related",
             options=pyro_options,
@@ -267,15 +313,13 @@ def main():
         )
 
         # Filter: include_in_oil_db
-        include_options = sorted(df["include_in_oil_db"].dropna().unique().tolist())
         include_selected = st.multiselect(
             "include_in_oil_db",
             options=include_options,
             default=include_options,
         )
 
-        # Flags filter: build universe once
-        all_flags = build_flag_universe(df)
+        # Flags filter
         if all_flags:
             flags_selected = st.multiselect(
                 "Filter by flags (ANY of selected)",
@@ -297,36 +341,33 @@ def main():
             "Show only rows without manual review", value=False
         )
 
-    # Apply filters
-    df_filtered = df.copy()
+    # Apply filters: AND every predicate into one boolean mask, then index once
+    mask = np.ones(len(df), dtype=bool)
 
     if pyro_selected:
-        df_filtered = df_filtered[df_filtered["pyrolysis_related"].isin(pyro_selected)]
+        mask &= df["pyrolysis_related"].isin(pyro_selected).to_numpy()
 
     if include_selected:
-        df_filtered = df_filtered[df_filtered["include_in_oil_db"].isin(include_selected)]
+        mask &= df["include_in_oil_db"].isin(include_selected).to_numpy()
 
     if flags_selected:
-        # Keep rows that contain ANY of the selected flags
-        df_filtered = df_filtered[
-            df_filtered["flags_list"].apply(
-                lambda flist: any(f in flist for f in flags_selected)
-            )
-        ]
+        # Keep rows that contain ANY of the selected flags (isdisjoint runs in C)
+        selected_set = frozenset(flags_selected)
+        mask &= ~df["flags_set"].map(selected_set.isdisjoint).to_numpy(dtype=bool)
 
     if search_text.strip():
         pattern = search_text.strip()
-        df_filtered = df_filtered[
-            df_filtered["abstract"].str.contains(pattern, case=False, na=False)
-        ]
+        # Plain substring on the pre-lowered column (no regex compile / case folding per rerun)
+        mask &= df["abstract_lower"].str.contains(pattern.lower(), regex=False).to_numpy(dtype=bool)
 
     if only_without_review:
-        mask = (
-            df_filtered["pyrolysis_related_gold"].isna()
-            & df_filtered["include_in_oil_db_gold"].isna()
-            & df_filtered["review_comment"].isna()
-        )
-        df_filtered = df_filtered[mask]
+        mask &= (
+            df["pyrolysis_related_gold"].isna()
+            & df["include_in_oil_db_gold"].isna()
+            & df["review_comment"].isna()
+        ).to_numpy()
+
+    df_filtered = df[mask]
 
     filtered_count = len(df_filtered)
 
@@ -364,10 +405,8 @@ def main():
                 st.session_state.current_index += 1
 
     with nav_cols[2]:
-        import random
-
         if st.button("🎲 Random"):
-            st.session_state.current_index = random.randint(0, filtered_count - 1)
+            st.session_state.current_index = random.randrange(filtered_count)
 
     with nav_cols[3]:
         idx_input = st.number_input(
@@ -1,19 +1,20 @@
 # -*- coding: utf-8 -*-
 """
 Batch PII XML Downloader Engine (with success/failure logs)
-- CSV 입력 → URL에서 PII 추출 → subprocess 병렬 다운로드
+- CSV 입력 → URL에서 PII 추출 → 한 process 안에서 asyncio 로 병렬 다운로드
 - 성공/실패 전체 로그 + 실패 전용 로그 생성
 """
 
 import argparse
+import asyncio
+import importlib.util
 import pandas as pd
 import re
-import subprocess
-from multiprocessing import Pool
 from tqdm import tqdm
 import os
 import logging
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # ------------------------------------------------------------
@@ -43,31 +44,55 @@ fail_logger.addHandler(fail_handler)
 # ------------------------------------------------------------
 # Extract PII from URL
 # ------------------------------------------------------------
+PII_RE = re.compile(r"/pii/([A-Za-z0-9().-]+)")
+
+
 def extract_pii(url: str) -> str:
-    match = re.search(r"/pii/([A-Za-z0-9().-]+)", url)
+    match = PII_RE.search(url)
     if match:
         return match.group(1).strip()
     return None
 
 
 # ------------------------------------------------------------
-# subprocess runner for downloader
+# In-process downloader (PII 마다 python interpreter 를 새로 띄우지 않음)
 # ------------------------------------------------------------
-def run_downloader(task):
-    pii, view, script_path = task
-    cmd = [
-        sys.executable,
-        script_path,
-        "--pii", pii,
-        "--view", view
-    ]
-
-    try:
-        subprocess.run(cmd, check=True)
-        return (pii, "OK")
-
-    except Exception as e:
-        return (pii, f"FAIL: {e}")
+def load_downloader(script_path: str):
+    # --script 의 downloader 를 module 로 load 해서 download_pii() 를 직접 호출
+    spec = importlib.util.spec_from_file_location("pii_xml_downloader", script_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    # redownload 스크립트가 읽는 download_xml.log 는 계속 기록
+    dl_handler = logging.FileHandler("download_xml.log", encoding="utf-8")
+    dl_handler.setFormatter(logging.Formatter("%(asctime)s | %(levelname)s | %(message)s"))
+    module.logger.addHandler(dl_handler)
+    return module
+
+
+async def download_all(downloader, piis, view, n_workers):
+    # to_thread 는 loop 의 default executor (기본 min(32, cpu+4) thread) 를 쓰므로
+    # --n_cpus 만큼 thread 를 가진 pool 로 교체 (asyncio.run 이 끝날 때 shutdown)
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=n_workers))
+    sem = asyncio.Semaphore(n_workers)
+    pbar = tqdm(total=len(piis))
+
+    async def one(pii):
+        async with sem:
+            try:
+                # requests 는 blocking 이므로 worker thread 에서 실행
+                await asyncio.to_thread(downloader.download_pii, pii, view)
+                status = "OK"
+            except Exception as e:
+                downloader.logger.error(f"Failed to fetch: {e}")
+                status = f"FAIL: {e}"
+        pbar.update(1)
+        return (pii, status)
+
+    # gather 는 입력 순서대로 결과를 돌려줌 (download_results.csv 순서 유지)
+    results = await asyncio.gather(*(one(pii) for pii in piis))
+    pbar.close()
+    return results
 
 
 # ------------------------------------------------------------
@@ -78,7 +103,7 @@ def main():
     parser.add_argument("--csv", required=True, help="CSV file containing URLs")
     parser.add_argument("--view", default="META_ABS", help="Elsevier API view type")
     parser.add_argument("--script", default="pii_xml_downloader.py", help="Downloader script path")
-    parser.add_argument("--n_cpus", type=int, default=4, help="Number of parallel workers")
+    parser.add_argument("--n_cpus", type=int, default=4, help="Number of concurrent downloads")
 
     args = parser.parse_args()
 
@@ -89,18 +114,27 @@ def main():
     #     raise ValueError("CSV must contain a 'url' column")
 
     # Extract PII
-    # df["pii"] = df["url"].apply(extract_pii)
+    # df["pii"] = df["url"].str.extract(PII_RE.pattern, expand=False)   # vectorized extract_pii
     df_valid = df[df["pii"].notna()].copy()
 
     logging.info(f"Valid PII count = {len(df_valid)}")
 
-    tasks = [(row["pii"], args.view, args.script) for _, row in df_valid.iterrows()]
+    # 이미 xmls/<pii>__<view>.xml 이 있는 PII 는 다시 받지 않음 (directory listing 한 번으로 판단)
+    os.makedirs("xmls", exist_ok=True)
+    with os.scandir("xmls") as it:
+        done = {e.name for e in it if e.name.endswith(".xml")}
+    already = df_valid["pii"].map(lambda pii: f"{str(pii).strip()}__{args.view}.xml" in done)
+    if already.any():
+        logging.info(f"Skipping already-downloaded PIIs: {int(already.sum())}")
+    df_valid = df_valid[~already]
+
+    piis = df_valid["pii"].tolist()
 
     # Parallel processing
     logging.info(f"Starting parallel downloads (n_cpus={args.n_cpus})")
 
-    with Pool(args.n_cpus) as pool:
-        results = list(tqdm(pool.imap(run_downloader, tasks), total=len(tasks)))
+    downloader = load_downloader(args.script)
+    results = asyncio.run(download_all(downloader, piis, args.view, args.n_cpus))
 
     # Save results
     out_csv = "download_results.csv"
@@ -13,6 +13,9 @@ API_KEY = "3c271c9aec7337d30416c170817761ad"
 
 os.makedirs(SAVE_DIR, exist_ok=True)
 
+# URL 마다 새 연결을 맺지 않도록 keep-alive session 재사용
+SESSION = requests.Session()
+
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s | %(levelname)s | %(message)s"
@@ -22,26 +25,25 @@ logging.basicConfig(
 # 1. 로그에서 실패한 URL 추출
 # -------------------------------------------------------
 def extract_failed_urls(log_file):
-    failed = []
+    failed = set()  # unique
     pat = re.compile(r"Requesting:\s+(https?://[^\s]+)")
 
-    with open(log_file, "r", encoding="utf-8", errors="ignore") as f:
-        lines = f.readlines()
-
     last_url = None
 
-    for line in lines:
-        if "Requesting:" in line:
-            # remember last request
-            m = pat.search(line)
-            if m:
-                last_url = m.group(1)
+    # 한 줄씩 읽음 (log 전체를 메모리에 올리지 않음)
+    with open(log_file, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            if "Requesting:" in line:
+                # remember last request
+                m = pat.search(line)
+                if m:
+                    last_url = m.group(1)
 
-        if "Failed to fetch" in line and last_url:
-            failed.append(last_url)
-            last_url = None
+            if "Failed to fetch" in line and last_url:
+                failed.add(last_url)
+                last_url = None
 
-    return list(set(failed))  # unique
+    return list(failed)
 
 
 # -------------------------------------------------------
@@ -49,11 +51,6 @@ def extract_failed_urls(log_file):
 # -------------------------------------------------------
 def download_and_save(url):
     try:
-        r = requests.get(url, timeout=20)
-        if r.status_code != 200:
-            logging.error(f"Status {r.status_code}: {url}")
-            return False
-
         # PII 파일명 추출
         m = re.search(r"/pii/([^?]+)", url)
         if not m:
@@ -63,8 +60,17 @@ def download_and_save(url):
         pii = m.group(1)
         out = os.path.join(SAVE_DIR, f"{pii}__FULL.xml")
 
-        with open(out, "w", encoding="utf-8") as f:
-            f.write(r.text)
+        # 응답 전체를 메모리에 올리지 않고 chunk 단위로 바로 disk 에 기록 (text decode X, raw bytes)
+        with SESSION.get(url, timeout=20, stream=True) as r:
+            if r.status_code != 200:
+                logging.error(f"Status {r.status_code}: {url}")
+                return False
+
+            tmp = f"{out}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                for chunk in r.iter_content(chunk_size=1 << 16):
+                    f.write(chunk)
+            os.replace(tmp, out)
 
         logging.info(f"Saved XML → {out}")
         return True
@@ -82,7 +88,16 @@ def main():
 
     logging.info(f"Found failed URLs: {len(failed_urls)}")
 
+    # 이전 재시도에서 이미 저장된 PII 는 건너뜀 (directory listing 한 번으로 판단)
+    with os.scandir(SAVE_DIR) as it:
+        done = {e.name for e in it if e.name.endswith(".xml")}
+
     for url in tqdm(failed_urls, desc="Retry download"):
+        m = re.search(r"/pii/([^?]+)", url)
+        if m and f"{m.group(1)}__FULL.xml" in done:
+            logging.info(f"Already downloaded, skip: {url}")
+            continue
+
         # API key replacement if needed
         if "apiKey=" not in url:
             if "?" in url:
@@ -16,8 +16,11 @@ Usage:
 
 import os
 import re
+import mmap
 import argparse
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
 from typing import List, Optional
 
@@ -96,26 +99,40 @@ def extract_text_from_xml(path: str) -> Optional[str]:
     - 없으면 <body> 안의 모든 텍스트를 join.
     - 그래도 없으면 None 반환.
     """
+    # rawtext / body 만 streaming 으로 모으고, 처리한 element 는 바로 비움 (DOM 전체를 유지 X)
+    # file 은 mmap 으로 읽음 (page cache 를 그대로 사용, read() 로 buffer 에 다시 복사 X)
+    raw_parts = []
+    body_parts = []
+    root = None
     try:
-        tree = etree.parse(path)
-        root = tree.getroot()
+        with open(path, "rb") as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            ctx = etree.iterparse(
+                mm, events=("end",), tag=("{*}rawtext", "{*}body"), huge_tree=True
+            )
+            for _, el in ctx:
+                if etree.QName(el).localname == "rawtext":
+                    raw_parts.append(" ".join(el.itertext()))
+                else:
+                    body_parts.append(" ".join(el.itertext()))
+                el.clear()
+                while el.getprevious() is not None:
+                    del el.getparent()[0]
+
+            # rawtext / body 가 둘 다 없는 드문 경우에만 같은 mapping 으로 DOM 을 만듦
+            if not raw_parts and not body_parts:
+                root = etree.fromstring(mm, etree.XMLParser(huge_tree=True))
     except Exception as e:
         logger.error(f"XML parse error: {path} | {e}")
         return None
 
     # 1) rawtext 우선
-    raw_nodes = root.xpath("//*[local-name()='rawtext']//text()")
-    if raw_nodes:
-        text = " ".join(raw_nodes)
-        text = " ".join(text.split())
-        return text
+    if raw_parts:
+        return " ".join(" ".join(raw_parts).split())
 
     # 2) fallback: body 전체 텍스트
-    body_nodes = root.xpath("//*[local-name()='body']//text()")
-    if body_nodes:
-        text = " ".join(body_nodes)
-        text = " ".join(text.split())
-        return text
+    if body_parts:
+        return " ".join(" ".join(body_parts).split())
 
     # 3) 더이상 없으면 그냥 전체 문서 텍스트
     all_nodes = root.xpath("//text()")
@@ -133,11 +150,39 @@ def extract_text_from_xml(path: str) -> Optional[str]:
 def filter_fig_table_sentences(sentences: List[str]) -> List[str]:
     """
     문장 리스트에서 Fig./Figure/Table 키워드가 포함된 문장만 필터링.
+    (filter + bound method → loop 가 C 안에서 돌아감, 문장마다 Python frame X)
+    """
+    return list(filter(FIG_TABLE_PATTERN.search, sentences))
+
+
+# regex splitter 의 문장 경계 (공백이 정규화된 text 에서는 "[.!?] " 두 글자)
+_SENT_ENDS = (". ", "! ", "? ")
+
+
+def find_fig_table_sentences(text: str) -> List[str]:
+    """
+    split_sentences(regex) + filter_fig_table_sentences 와 같은 결과를,
+    keyword hit 주변에서만 문장 경계를 찾아서 만듦 (keyword 없는 대부분의 문장은 자르지 않음).
+    text 는 extract_text_from_xml 출력처럼 공백이 한 칸으로 정규화되어 있어야 함.
     """
     hits = []
-    for s in sentences:
-        if FIG_TABLE_PATTERN.search(s):
-            hits.append(s)
+    pos = 0
+    end = len(text)
+    while True:
+        m = FIG_TABLE_PATTERN.search(text, pos)
+        if not m:
+            break
+        start = m.start()
+
+        left = max(text.rfind(e, 0, start) for e in _SENT_ENDS)
+        left = 0 if left == -1 else left + 2
+        right = min(
+            (i for i in (text.find(e, start) for e in _SENT_ENDS) if i != -1),
+            default=end - 1,
+        ) + 1
+
+        hits.append(text[left:right].strip())
+        pos = right   # 같은 문장 안의 다음 keyword 는 건너뜀
     return hits
 
 
@@ -162,12 +207,17 @@ def process_single_xml(xml_path: str, out_dir: str) -> int:
         logger.info(f"[SKIP] No text extracted: {fname}")
         return 0
 
-    sentences = split_sentences(text)
-    if not sentences:
-        logger.info(f"[SKIP] No sentences parsed: {fname}")
-        return 0
+    if _HAS_NLTK:
+        # punkt 는 문서 전체 문맥이 필요 → 전체 분할 후 필터
+        sentences = split_sentences(text)
+        if not sentences:
+            logger.info(f"[SKIP] No sentences parsed: {fname}")
+            return 0
+
+        hit_sents = filter_fig_table_sentences(sentences)
+    else:
+        hit_sents = find_fig_table_sentences(text)
 
-    hit_sents = filter_fig_table_sentences(sentences)
     if not hit_sents:
         # 문장이 하나도 없으면 파일은 안쓰고 0 반환
         logger.info(f"[NO_FIG_TABLE] {fname}: 0 sentences")
@@ -187,7 +237,7 @@ def process_single_xml(xml_path: str, out_dir: str) -> int:
 # =======================================================
 # Main batch
 # =======================================================
-def run(xml_dir: str, out_dir: str):
+def run(xml_dir: str, out_dir: str, max_workers: Optional[int] = None):
     if not os.path.isdir(xml_dir):
         logger.error(f"XML dir not found: {xml_dir}")
         raise SystemExit(1)
@@ -205,11 +255,14 @@ def run(xml_dir: str, out_dir: str):
     total_hits = 0
     files_with_hits = 0
 
-    for path in tqdm(xml_files, desc="Processing XML"):
-        n = process_single_xml(path, out_dir)
-        total_hits += n
-        if n > 0:
-            files_with_hits += 1
+    # XML 마다 독립적인 CPU 작업 (lxml parse + 문장 분할 + regex) → process pool 로 분산
+    worker = partial(process_single_xml, out_dir=out_dir)
+    with ProcessPoolExecutor(max_workers=max_workers) as ex:
+        for n in tqdm(ex.map(worker, xml_files, chunksize=32),
+                      total=len(xml_files), desc="Processing XML"):
+            total_hits += n
+            if n > 0:
+                files_with_hits += 1
 
     logger.info("=== Summary ===")
     logger.info(f"Total XML files: {len(xml_files)}")
@@ -236,6 +289,12 @@ def parse_args():
         default="./fig_table_sentences",
         help="Output directory for .txt files (default: ./fig_table_sentences)"
     )
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: os.cpu_count())"
+    )
     return ap.parse_args()
 
 
@@ -249,5 +308,5 @@ if __name__ == "__main__":
     else:
         logger.info("nltk not available → using regex-based sentence splitter.")
 
-    run(args.xml_dir, args.out_dir)
+    run(args.xml_dir, args.out_dir, args.workers)
 
@@ -7,6 +7,8 @@ Stage 1: Elsevier PII XML Downloader
 
 import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
 import os
 
@@ -22,11 +24,39 @@ logging.basicConfig(
     ],
 )
 
+logger = logging.getLogger("pii_xml_downloader")
+
+# PII 마다 새 TCP+TLS 연결을 맺지 않도록 keep-alive session 재사용
+# (batch engine 의 worker thread 들이 같이 쓰므로 pool 을 넉넉하게)
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504]),
+))
+
+
 def save_xml(content, path):
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, "wb") as f:
         f.write(content)
-    logging.info(f"Saved XML → {path}")
+    logger.info(f"Saved XML → {path}")
+
+
+def download_pii(pii: str, view: str = "META_ABS"):
+    """PII 하나를 받아서 xmls/<pii>__<view>.xml 로 저장 (요청 실패 시 예외를 그대로 올림)"""
+    pii = pii.strip()
+    view = view.strip()
+
+    url = f"{BASE}/{pii}?apiKey={API_KEY}&view={view}"
+    logger.info(f"Requesting: {url}")
+
+    r = SESSION.get(url, timeout=10)
+    content = r.content  # RAW XML
+
+    filename = f"{pii}__{view}.xml"
+    save_xml(content, f"xmls/{filename}")
+
 
 def main():
     parser = argparse.ArgumentParser()
@@ -34,21 +64,11 @@ def main():
     parser.add_argument("--view", type=str, default="META_ABS")
     args = parser.parse_args()
 
-    pii = args.pii.strip()
-    view = args.view.strip()
-
-    url = f"{BASE}/{pii}?apiKey={API_KEY}&view={view}"
-    logging.info(f"Requesting: {url}")
-
     try:
-        r = requests.get(url, timeout=10)
-        content = r.content  # RAW XML
+        download_pii(args.pii, args.view)
     except Exception as e:
-        logging.error(f"Failed to fetch: {e}")
-        return
+        logger.error(f"Failed to fetch: {e}")
 
-    filename = f"{pii}__{view}.xml"
-    save_xml(content, f"xmls/{filename}")
 
 if __name__ == "__main__":
     main()
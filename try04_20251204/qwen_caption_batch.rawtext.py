@@ -13,13 +13,14 @@ Figure & Table Caption Detector for Elsevier rawtext XML
 
 - Table:
     - "Table" 키워드가 포함된 문장이 있을 때만 후보로 삼음.
+    - 'Table N.' 으로 시작하는 문장(캡션), 'in Table N' 같은 본문 인용(캡션 아님)은 규칙으로 바로 판별.
     - 그 문장(S0) + 뒤 두 문장(S1, S2)까지 최대 3문장을 LLM에 전달.
-    - LLM(QWEN via Ollama)은:
-        LABEL=TABLE_CAPTION or NOT_CAPTION
-        END_INDEX=-1/0/1/2 (캡션이 어디까지인지, -1이면 캡션 아님)
-        REASON=간단한 이유
-      형식으로 한 줄을 출력.
-    - 배치 처리 없이, candidate마다 한 번씩만 LLM 호출.
+    - LLM(QWEN via Ollama, format="json")은:
+        {"label": TABLE_CAPTION or NOT_CAPTION,
+         "end_index": -1/0/1/2 (캡션이 어디까지인지, -1이면 캡션 아님),
+         "reason": 간단한 이유}
+      형식의 JSON object 하나를 출력.
+    - candidate마다 한 번씩 LLM 호출하되, 전체 파일의 후보를 모아서 동시에 요청 (--concurrency).
 
 출력:
 - per-XML JSON: output_json_dir/<file>.json
@@ -31,7 +32,7 @@ Figure & Table Caption Detector for Elsevier rawtext XML
           "start_sent_idx": int,
           "end_sent_idx": int,
           "caption_text": "...",
-          "source": "RULE_FIG_PATTERN" or "LLM_TABLE",
+          "source": "RULE_FIG_PATTERN" or "RULE_TABLE_PATTERN" or "LLM_TABLE",
           "raw_window": [S0, S1, S2],
           "table_label": ...,
           "table_end_in_window": ...,
@@ -48,16 +49,46 @@ Figure & Table Caption Detector for Elsevier rawtext XML
 
 import os
 import re
+import csv
 import json
+import asyncio
+import hashlib
+import sqlite3
 import logging
 import argparse
-from typing import List, Dict, Optional
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from collections import Counter
+from typing import List, Dict, Optional, Tuple
 
 from lxml import etree
 from tqdm import tqdm
-import pandas as pd
+import httpx
 import ollama
 
+# orjson 이 있으면 per-XML JSON 저장 / Qwen 응답 parse 에 사용 (C/Rust encoder, bytes 로 바로 씀), 없으면 stdlib json
+# 기본은 compact (기계가 읽는 용도), pretty=True 면 indent=2
+try:
+    import orjson
+
+    def json_dumps_bytes(obj, pretty: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+    def json_dumps_bytes(obj, pretty: bool = False) -> bytes:
+        if pretty:
+            return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+# blingfire 가 있으면 문장 분할에 사용 (pip install blingfire), 없으면 regex fallback
+try:
+    from blingfire import text_to_sentences
+    _HAS_BLINGFIRE = True
+except ImportError:
+    _HAS_BLINGFIRE = False
+
 
 # =========================================================
 # CONFIG
@@ -65,10 +96,22 @@ import ollama
 DEFAULT_XML_DIR = "./xmls"
 DEFAULT_OUT_CSV = "captions_all.csv"
 DEFAULT_OUT_JSON_DIR = "./output_captions"
+DEFAULT_CACHE_DB = "qwen_table_cache.db"
+
+# Table 캡션 판별은 이진 분류 + END_INDEX 라서 작은 instruct 모델로 충분 (병렬 요청도 지원)
+# 30B ("qwen3:30b-a3b-instruct-2507-q4_K_M") 는 --qwen_model 로 spot-check 할 때만 사용
+QWEN_MODEL = "qwen2.5:7b-instruct-q4_K_M"   # 너 환경에 맞게 수정
 
-QWEN_MODEL = "qwen3:30b-a3b-instruct-2507-q4_K_M"   # 너 환경에 맞게 수정
+# Table 후보를 동시에 보낼 최대 요청 수 (ollama serve 쪽 OLLAMA_NUM_PARALLEL 과 맞출 것, 예: 8)
+TABLE_CONCURRENCY = 8
 
-# 문장 분할 시 Fig. 잘리는 문제 방지용 치환 토큰
+# 전체 CSV 컬럼 순서 (record dict 의 key 순서와 같음)
+CSV_FIELDS = [
+    "type", "id", "start_sent_idx", "end_sent_idx", "caption_text", "source",
+    "raw_window", "table_label", "table_end_in_window", "table_reason", "file",
+]
+
+# 문장 분할 시 Fig. 잘리는 문제 방지용 치환 토큰 (regex fallback 용)
 FIG_TOKEN = "FIGSPECIALTOKEN"
 FIGS_TOKEN = "FIGSSPECIALTOKEN"
 
@@ -86,26 +129,32 @@ logger = logging.getLogger(__name__)
 # =========================================================
 # XML → rawtext 추출
 # =========================================================
+_WS_RE = re.compile(r"\s+")
+
+
 def extract_rawtext_from_xml(path: str) -> Optional[str]:
     """
     XML 파일에서 <rawtext> (또는 <xocs:rawtext>) 태그 내부 텍스트만 추출.
     여러 노드가 있을 경우 모두 이어붙임.
     """
+    # rawtext 만 streaming 으로 모으고, 처리한 element 는 바로 비움 (DOM 전체를 만들지 않음)
+    parts = []
     try:
-        tree = etree.parse(path)
-        root = tree.getroot()
+        ctx = etree.iterparse(path, events=("end",), tag="{*}rawtext", huge_tree=True)
+        for _, el in ctx:
+            parts.append(" ".join(el.itertext()))
+            el.clear(keep_tail=True)
+            while el.getprevious() is not None:
+                del el.getparent()[0]
     except Exception as e:
         logger.error(f"XML parse error: {path} | {e}")
         return None
 
-    nodes = root.xpath("//*[local-name()='rawtext']//text()")
-    if not nodes:
+    if not parts:
         return None
 
-    text = " ".join(nodes)
-    text = text.replace("\r", " ")
-    text = " ".join(text.split())
-    return text.strip()
+    # \r 포함 모든 공백 run 을 한 칸으로 (split() 처럼 token list 를 만들지 않음)
+    return _WS_RE.sub(" ", " ".join(parts)).strip()
 
 
 # =========================================================
@@ -113,9 +162,10 @@ def extract_rawtext_from_xml(path: str) -> Optional[str]:
 # =========================================================
 _SENT_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
 
-def split_sentences(text: str) -> List[str]:
+
+def _split_sentences_regex(text: str) -> List[str]:
     """
-    아주 단순한 영문 문장 분할.
+    아주 단순한 영문 문장 분할 (blingfire 없을 때 fallback).
     - 'Fig.'에서 잘려나가지 않도록 사전 치환 후 분할, 이후 복원.
     """
     # Fig. → FIGSPECIALTOKEN, Figs. → FIGSSPECIALTOKEN
@@ -132,41 +182,87 @@ def split_sentences(text: str) -> List[str]:
     return restored
 
 
+def split_sentences(text: str) -> List[str]:
+    """
+    영문 문장 분할.
+    - blingfire 가 있으면 text_to_sentences (C++ 구현) 사용
+      regex fallback 과 같이 'Fig.' / 'Figs.' 를 token 으로 치환한 뒤 분할, 이후 복원
+      (그대로 넘기면 'high. Fig. 4.' 처럼 caption label 이 앞 문장에 붙거나 'Fig.' / '5.' 로 잘림)
+    - 없으면 regex fallback.
+    """
+    if not _HAS_BLINGFIRE:
+        return _split_sentences_regex(text)
+
+    tmp = text.replace("Fig.", FIG_TOKEN).replace("Figs.", FIGS_TOKEN)
+    sents: List[str] = []
+    for s in text_to_sentences(tmp).split("\n"):
+        s = s.strip()
+        if s:
+            sents.append(s.replace(FIG_TOKEN, "Fig.").replace(FIGS_TOKEN, "Figs."))
+    return sents
+
+
+# =========================================================
+# Fig/Table 사전 필터
+# =========================================================
+# FIG_PATTERN | TABLE_KEYWORD_PAT 를 하나로 합친 것 (둘 중 하나라도 걸리는 문장 = 이 패턴에 걸리는 문장)
+_CAPTION_HINT_RE = re.compile(r"\bFig\.\s*\d|\bTables?\b", re.IGNORECASE)
+
+
+def caption_hint_indices(sentences: List[str]) -> List[int]:
+    """
+    Figure / Table 후보가 될 수 있는 문장 index 만 한 번의 pass 로 추림.
+    (대부분의 문장은 여기서 걸러지고, 정확한 판별은 각 detector 에서)
+    regex 전에 lower() + substring 검사로 'fig' / 'table' 이 없는 문장을 먼저 버림 (memchr 수준, regex 보다 훨씬 쌈).
+    'ı' / 'İ'(lower → i + U+0307) 는 IGNORECASE regex 에선 i 로 매칭되므로 같이 통과시킴.
+    """
+    hint = _CAPTION_HINT_RE.search
+    hits = []
+    for i, s in enumerate(sentences):
+        low = s.lower()
+        if ("fig" in low or "table" in low or "\u0131" in low or "\u0307" in low) and hint(s):
+            hits.append(i)
+    return hits
+
+
 # =========================================================
 # Figure 캡션 검출 (규칙 기반)
 # =========================================================
 FIG_PATTERN = re.compile(r"\bFig\.\s*\d+", re.IGNORECASE)
+_FIG_NUM_RE = re.compile(r"Fig\.\s*([0-9]+[a-zA-Z]?)")
 
-def detect_figure_captions(sentences: List[str]) -> List[Dict]:
+def detect_figure_captions(sentences: List[str],
+                           hits: Optional[List[int]] = None) -> List[Dict]:
     """
     문장 리스트에서 Fig. x. 패턴을 찾아 Figure 캡션 구간을 검출.
     - Fig. x. 포함 문장 = 캡션 시작
     - 그 뒤 최대 2문장까지 포함 (총 3문장)
-    - 이미 사용된 문장은 중복 사용하지 않도록 관리
+    - 이미 사용된 문장은 중복 사용하지 않도록 관리 (캡션 범위는 연속이라 다음 사용 가능 index 하나만 기억)
+    hits: caption_hint_indices 결과가 있으면 그 문장들만 검사 (오름차순)
     """
-    used = [False] * len(sentences)
     results: List[Dict] = []
+    next_free = 0
 
-    for i, s in enumerate(sentences):
-        if used[i]:
+    if hits is None:
+        hits = range(len(sentences))
+
+    for i in hits:
+        if i < next_free:
             continue
+        s = sentences[i]
 
-        if FIG_PATTERN.search(s):
+        m = FIG_PATTERN.search(s)
+        if m:
             # Figure 번호 추출
-            m = FIG_PATTERN.search(s)
+            # m.group() 예: "Fig. 1" → 숫자만 추출 (match 위치부터 검색, slice 안 만듦)
             fig_no = None
-            if m:
-                # m.group() 예: "Fig. 1" → 숫자만 추출
-                tail = s[m.start():]
-                m_num = re.search(r"Fig\.\s*([0-9]+[a-zA-Z]?)", tail)
-                if m_num:
-                    fig_no = m_num.group(1)
+            m_num = _FIG_NUM_RE.search(s, m.start())
+            if m_num:
+                fig_no = m_num.group(1)
 
             start_idx = i
             end_idx = min(i + 2, len(sentences) - 1)
-
-            for k in range(start_idx, end_idx + 1):
-                used[k] = True
+            next_free = end_idx + 1
 
             caption_text = " ".join(sentences[start_idx:end_idx + 1])
 
@@ -189,78 +285,52 @@ def detect_figure_captions(sentences: List[str]) -> List[Dict]:
 # =========================================================
 # Table 캡션 판별용 QWEN 호출
 # =========================================================
-def build_table_prompt(s0: str, s1: str, s2: str) -> str:
-    """
-    Table 후보 3문장(S0, S1, S2)에 대해 QWEN에게 판별을 요청하는 프롬프트.
-    출력 포맷:
-        LABEL=<TABLE_CAPTION or NOT_CAPTION>;
-        END_INDEX=< -1, 0, 1, 2 >;
-        REASON=<짧은 이유>
-    한 줄로만 출력하도록 강하게 요구.
-    """
-    prompt = f"""
-You are helping to detect TABLE captions in Elsevier-style scientific articles.
-
-You are given up to three sentences, S0, S1, S2. S0 contains the word "Table" or "Tables".
-In Elsevier articles, a table caption is usually a short block of text describing the content of the table.
-
-Your task:
-1) Decide if these sentences form a TABLE CAPTION or NOT.
-2) If it is a TABLE CAPTION, determine up to which sentence the caption extends:
-   - 0: only S0 is the caption.
-   - 1: S0 and S1 together form the caption.
-   - 2: S0, S1, and S2 together form the caption.
-3) If it is NOT a caption, use -1.
-
-Respond in EXACTLY ONE LINE with the following format:
-
-LABEL=<TABLE_CAPTION or NOT_CAPTION>; END_INDEX=< -1 or 0 or 1 or 2 >; REASON=<very short explanation in English>
+# 고정 지시문은 system message 로 한 번만 (모든 요청에서 같은 prefix → 서버 쪽 prompt cache 재사용)
+TABLE_SYSTEM_PROMPT = """
+Detect TABLE captions in Elsevier articles. S0 contains "Table"/"Tables"; S1, S2 follow it.
+Is S0 (plus following sentences) a table caption? end_index = last caption sentence (0, 1 or 2), -1 if not a caption.
+Answer with ONLY this JSON object:
+{"label": "TABLE_CAPTION" or "NOT_CAPTION", "end_index": -1|0|1|2, "reason": "<few words>"}
+""".strip()
 
-Do NOT add anything before 'LABEL='. Do NOT add extra lines.
+# format="json" 으로 응답을 JSON object 로 고정, 한 줄짜리 object 라 decode 길이를 여기서 자름
+TABLE_OPTIONS = {"num_predict": 80, "temperature": 0}
 
-Here are the sentences:
 
-[S0] {s0}
-[S1] {s1}
-[S2] {s2}
-""".strip()
-    return prompt
+def build_table_prompt(s0: str, s1: str, s2: str) -> str:
+    """
+    Table 후보 3문장(S0, S1, S2)에 대해 QWEN에게 보내는 user message.
+    지시문/출력 포맷은 TABLE_SYSTEM_PROMPT 에 있음:
+        {"label": TABLE_CAPTION or NOT_CAPTION,
+         "end_index": -1, 0, 1, 2,
+         "reason": 짧은 이유}
+    """
+    return f"[S0] {s0}\n[S1] {s1}\n[S2] {s2}"
 
 
 def parse_table_response(text: str) -> Dict:
     """
-    QWEN 응답에서 LABEL, END_INDEX, REASON 파싱.
-    LABEL=<...>; END_INDEX=<...>; REASON=<...>
-    형태를 정규식으로 추출.
+    QWEN 응답(JSON object)에서 label, end_index, reason 파싱 + 검증.
+    {"label": ..., "end_index": ..., "reason": ...}
+    JSON 이 아니거나 (num_predict 에서 잘린 경우 등) 값이 이상하면 PARSE_ERROR.
     """
-    # 첫 번째로 'LABEL='이 등장하는 위치부터 이후만 사용
-    idx = text.find("LABEL=")
-    if idx >= 0:
-        text = text[idx:]
-
-    # 멀티라인일 경우 한 줄로
-    text_one = " ".join(text.splitlines())
-    # 공백 정리
-    text_one = " ".join(text_one.split())
-
-    # LABEL, END_INDEX, REASON 추출
-    m = re.search(
-        r"LABEL\s*=\s*([A-Z_]+)\s*;\s*END_INDEX\s*=\s*(-?\d+)\s*;\s*REASON\s*=\s*(.+)",
-        text_one
-    )
-    if not m:
+    try:
+        obj = json_loads(text)
+    except ValueError:
+        obj = None
+    if not isinstance(obj, dict):
         return {
             "label": "PARSE_ERROR",
             "end_index": -1,
-            "reason": f"raw: {text_one[:200]}"
+            "reason": f"raw: {' '.join(text.split())[:200]}"
         }
 
-    label = m.group(1).upper()
+    label = str(obj.get("label", "")).strip().upper()
     try:
-        end_idx = int(m.group(2))
-    except ValueError:
+        end_idx = int(obj.get("end_index", -1))
+    except (TypeError, ValueError):
         end_idx = -1
-    reason = m.group(3).strip()
+    reason = str(obj.get("reason", "")).strip()
 
     # sanity check
     if label not in ("TABLE_CAPTION", "NOT_CAPTION"):
@@ -276,17 +346,23 @@ def parse_table_response(text: str) -> Dict:
     }
 
 
-def call_qwen_table(s0: str, s1: str, s2: str) -> Dict:
+async def call_qwen_table(client: ollama.AsyncClient, s0: str, s1: str, s2: str,
+                          model: str = QWEN_MODEL) -> Dict:
     """
     Table 캡션 여부를 QWEN(Qwen via Ollama)에 물어봄.
-    배치 없이 한 번에 하나만 요청.
+    후보 하나당 요청 하나 (여러 후보는 query_table_candidates 에서 동시에 보냄).
     """
     prompt = build_table_prompt(s0, s1, s2)
 
     try:
-        resp = ollama.chat(
-            model=QWEN_MODEL,
-            messages=[{"role": "user", "content": prompt}],
+        resp = await client.chat(
+            model=model,
+            messages=[
+                {"role": "system", "content": TABLE_SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            format="json",
+            options=TABLE_OPTIONS,
         )
         content = resp["message"]["content"].strip()
     except Exception as e:
@@ -301,37 +377,131 @@ def call_qwen_table(s0: str, s1: str, s2: str) -> Dict:
     return parsed
 
 
+async def query_table_candidates(windows: List[Tuple[str, str, str]],
+                                 concurrency: int = TABLE_CONCURRENCY,
+                                 model: str = QWEN_MODEL,
+                                 pbar=None,
+                                 host: Optional[str] = None) -> List[Dict]:
+    """
+    (S0, S1, S2) window 들을 한꺼번에 QWEN 에 보냄.
+    최대 concurrency 개가 동시에 in-flight → 서버에서 batching.
+    결과는 windows 와 같은 순서.
+    """
+    # 모든 요청이 client 하나를 공유 (httpx connection pool).
+    # keep-alive pool 을 concurrency 만큼 잡아서 (httpx 기본 20개) 요청마다 새 TCP 연결을 맺지 않게 함
+    client = ollama.AsyncClient(
+        host=host,
+        limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+    )
+    sem = asyncio.Semaphore(concurrency)
+
+    async def bounded(window):
+        async with sem:
+            res = await call_qwen_table(client, *window, model=model)
+        if pbar is not None:
+            pbar.update(1)
+        return res
+
+    try:
+        return await asyncio.gather(*(bounded(w) for w in windows))
+    finally:
+        # asyncio.run 이 loop 를 닫기 전에 pool 의 connection 정리
+        await client._client.aclose()
+
+
+# =========================================================
+# Table 판별 결과 cache (SQLite, 실행 간 공유)
+# =========================================================
+def open_table_cache(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE IF NOT EXISTS kv (k BLOB PRIMARY KEY, v TEXT)")
+    return conn
+
+
+def table_cache_key(model: str, window: Tuple[str, str, str]) -> bytes:
+    """
+    모델 + system prompt + (S0, S1, S2) 로 key 생성 (모델이나 지시문이 바뀌면 자동으로 cache miss).
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for part in (model, TABLE_SYSTEM_PROMPT, *window):
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.digest()
+
+
 # =========================================================
 # Table 캡션 검출 (LLM 기반)
 # =========================================================
 TABLE_KEYWORD_PAT = re.compile(r"\bTable[s]?\b", re.IGNORECASE)
+_TABLE_NUM_RE = re.compile(r"\bTable\s*([0-9]+[a-zA-Z]?)", re.IGNORECASE)
+
+def table_candidates(sentences: List[str],
+                     hits: Optional[List[int]] = None) -> List[Tuple[int, str, str, str]]:
+    """
+    'Table' 키워드가 들어간 모든 문장 i 에 대해 (i, S0, S1, S2) window 를 만듦.
+    (앞 캡션 범위에 포함되어 나중에 건너뛰는 후보도 포함 → LLM 호출을 미리 한꺼번에 보낼 수 있음)
+    hits: caption_hint_indices 결과가 있으면 그 문장들만 검사
+    """
+    n = len(sentences)
+    if hits is None:
+        hits = range(n)
+    cands = []
+    for i in hits:
+        s = sentences[i]
+        if TABLE_KEYWORD_PAT.search(s):
+            s1 = sentences[i+1] if i+1 < n else ""
+            s2 = sentences[i+2] if i+2 < n else ""
+            cands.append((i, s, s1, s2))
+    return cands
+
+
+# "Table 3. ..." / "Table 2: ..." 처럼 문장 첫머리가 Table 번호 → 캡션으로 확정
+_STRONG_CAP_RE = re.compile(r"^\s*Tables?\s*\d+[a-zA-Z]?\s*[.:–-]")
+# "in Table 3", "see Table 2" 같은 본문 인용
+_CITE_RE = re.compile(r"\b(?:in|see|from|of|to)\s+Tables?\s*\d+", re.IGNORECASE)
+# "Table 2 Kinetic parameters ..." 처럼 구두점 없이 Table 번호로 시작 (Elsevier rawtext 캡션 형태)
+_TABLE_LEAD_RE = re.compile(r"\s*Tables?\s*\d")
+
 
-def detect_table_captions(sentences: List[str]) -> List[Dict]:
+def rule_table_label(s0: str) -> Optional[Dict]:
+    """
+    LLM 없이 판별 가능한 Table 후보는 바로 결과(QWEN 결과와 같은 형태)를 돌려줌.
+    - 문장이 'Table N.' 으로 시작하고 뒤에 설명이 있음 → TABLE_CAPTION (S0 만)
+      ('Table 1.' 만 따로 잘린 문장은 캡션이 S1 까지 이어지므로 QWEN 에 물어봄)
+    - 본문 인용('in Table N' 등)만 있음 → NOT_CAPTION
+      (문장이 Table 번호로 시작하면 캡션 안의 인용일 수 있으므로 QWEN 에 물어봄)
+    - 나머지(애매한 경우) → None (QWEN 에 물어봄)
+    """
+    m = _STRONG_CAP_RE.match(s0)
+    if m and s0[m.end():].strip():
+        return {"label": "TABLE_CAPTION", "end_index": 0,
+                "reason": "rule: sentence starts with Table number", "source": "RULE_TABLE_PATTERN"}
+    if not _TABLE_LEAD_RE.match(s0) and _CITE_RE.search(s0):
+        return {"label": "NOT_CAPTION", "end_index": -1,
+                "reason": "rule: in-text Table citation", "source": "RULE_TABLE_PATTERN"}
+    return None
+
+
+def detect_table_captions(n: int,
+                          q_by_idx: Dict[int, Tuple[Tuple[str, str, str], Dict]]) -> List[Dict]:
     """
     문장 리스트에서 'Table' 키워드가 들어간 문장을 후보로 잡고,
     S0(해당 문장) + S1, S2까지를 QWEN에 넘겨서 캡션 여부와 범위를 판별.
+    n: 문서 전체 문장 수
+    q_by_idx: 후보 문장 index → ((S0, S1, S2), QWEN 결과)  (run_batch 에서 모든 파일 것을 한꺼번에 호출)
+    앞에서부터 순서대로 결과를 적용 (캡션 범위 안의 후보는 건너뜀)
+    캡션 범위는 항상 window 안 (i ~ i+2) 이라서 문장 리스트 전체는 필요 없음.
+    (후보 index 만 오름차순으로 돌고, 캡션 범위 끝 다음 index 하나만 기억)
     """
-    used = [False] * len(sentences)
     results: List[Dict] = []
+    next_free = 0
 
-    i = 0
-    n = len(sentences)
-    while i < n:
-        if used[i]:
-            i += 1
+    for i in sorted(q_by_idx):
+        if i < next_free:
             continue
 
-        s = sentences[i]
-        if not TABLE_KEYWORD_PAT.search(s):
-            i += 1
-            continue
-
-        # 후보 window 구성
-        s0 = s
-        s1 = sentences[i+1] if i+1 < n else ""
-        s2 = sentences[i+2] if i+2 < n else ""
-
-        q_res = call_qwen_table(s0, s1, s2)
+        # 후보 window + QWEN 결과
+        (s0, s1, s2), q_res = q_by_idx[i]
         label = q_res["label"]
         end_in_win = q_res["end_index"]
         reason = q_res["reason"]
@@ -341,25 +511,20 @@ def detect_table_captions(sentences: List[str]) -> List[Dict]:
             end_idx = min(i + end_in_win, n - 1)
             start_idx = i
 
-            for k in range(start_idx, end_idx + 1):
-                used[k] = True
-
             # Table 번호 추출 시도
-            text_window = " ".join(sentences[start_idx:end_idx + 1])
+            caption_text = " ".join((s0, s1, s2)[:end_idx - start_idx + 1])
             table_id = None
-            m = re.search(r"\bTable\s*([0-9]+[a-zA-Z]?)", text_window, re.IGNORECASE)
+            m = _TABLE_NUM_RE.search(caption_text)
             if m:
                 table_id = m.group(1)
 
-            caption_text = " ".join(sentences[start_idx:end_idx + 1])
-
             results.append({
                 "type": "TABLE",
                 "id": table_id,
                 "start_sent_idx": start_idx,
                 "end_sent_idx": end_idx,
                 "caption_text": caption_text,
-                "source": "LLM_TABLE",
+                "source": q_res.get("source", "LLM_TABLE"),
                 "raw_window": [s0, s1, s2],
                 "table_label": label,
                 "table_end_in_window": end_in_win,
@@ -367,22 +532,21 @@ def detect_table_captions(sentences: List[str]) -> List[Dict]:
             })
 
             # 이미 이 범위는 사용되었으니 end_idx+1 부터 다시 탐색
-            i = end_idx + 1
+            next_free = end_idx + 1
         else:
-            # 캡션 아님 혹은 파싱 에러 → 문장만 넘기고 i+1에서 계속
+            # 캡션 아님 혹은 파싱 에러 → 문장만 넘기고 다음 후보에서 계속
             results.append({
                 "type": "TABLE",
                 "id": None,
                 "start_sent_idx": i,
                 "end_sent_idx": i,
                 "caption_text": s0,
-                "source": "LLM_TABLE",
+                "source": q_res.get("source", "LLM_TABLE"),
                 "raw_window": [s0, s1, s2],
                 "table_label": label,
                 "table_end_in_window": end_in_win,
                 "table_reason": reason,
             })
-            i += 1
 
     return results
 
@@ -390,29 +554,45 @@ def detect_table_captions(sentences: List[str]) -> List[Dict]:
 # =========================================================
 # 단일 XML 파일 처리
 # =========================================================
-def process_single_xml(path: str, out_json_dir: str) -> List[Dict]:
+def stage1_extract(path: str):
     """
-    한 XML 파일에 대해:
+    한 XML 파일에 대해 LLM 이 필요 없는 부분:
       - rawtext 추출
       - 문장 분할
       - Figure 캡션(규칙 기반) 탐지
-      - Table 캡션(LLM 기반) 탐지
-      - 결과를 JSON(+리스트)로 반환 & per-XML JSON 저장
+      - Table 후보 window 수집
+    반환: (문장 수, fig_caps, table_cands)  / rawtext·문장이 없으면 None
+    (process pool 에서 돌기 때문에 문장 리스트 전체는 돌려보내지 않음 → pickle/IPC 양 최소화)
     """
     fname = os.path.basename(path)
 
     rawtext = extract_rawtext_from_xml(path)
     if not rawtext:
         logger.info(f"[{fname}] No rawtext found.")
-        return []
+        return None
 
     sentences = split_sentences(rawtext)
     if not sentences:
         logger.info(f"[{fname}] No sentences parsed.")
-        return []
+        return None
+
+    # Fig/Table 둘 중 하나라도 걸리는 문장만 한 번에 골라 두고, 각 detector 는 그 문장만 봄
+    hits = caption_hint_indices(sentences)
+    fig_caps = detect_figure_captions(sentences, hits)
+    table_cands = table_candidates(sentences, hits)
+    return len(sentences), fig_caps, table_cands
 
-    fig_caps = detect_figure_captions(sentences)
-    tab_caps = detect_table_captions(sentences)
+
+def stage2_finalize(path: str, n_sents: int, fig_caps: List[Dict],
+                    q_by_idx: Dict, out_json_dir: str, pretty: bool = False) -> List[Dict]:
+    """
+    QWEN 결과(q_by_idx)를 받아서
+      - Table 캡션 범위 결정
+      - 결과를 리스트로 반환 & per-XML JSON 저장
+    """
+    fname = os.path.basename(path)
+
+    tab_caps = detect_table_captions(n_sents, q_by_idx)
 
     logger.info(
         f"[{fname}] Figure captions: {len(fig_caps)}, Table records: {len(tab_caps)}"
@@ -428,8 +608,8 @@ def process_single_xml(path: str, out_json_dir: str) -> List[Dict]:
     if all_records:
         os.makedirs(out_json_dir, exist_ok=True)
         out_path = os.path.join(out_json_dir, fname.replace(".xml", ".json"))
-        with open(out_path, "w", encoding="utf-8") as f:
-            json.dump(all_records, f, ensure_ascii=False, indent=2)
+        with open(out_path, "wb") as f:
+            f.write(json_dumps_bytes(all_records, pretty))
         logger.info(f"[{fname}] Saved JSON → {out_path}")
 
     return all_records
@@ -438,37 +618,118 @@ def process_single_xml(path: str, out_json_dir: str) -> List[Dict]:
 # =========================================================
 # 전체 배치 처리
 # =========================================================
-def run_batch(xml_dir: str, out_csv: str, out_json_dir: str):
-    xml_files = [
-        os.path.join(xml_dir, f)
-        for f in os.listdir(xml_dir)
-        if f.lower().endswith(".xml")
-    ]
-    xml_files.sort()
+def run_batch(xml_dir: str, out_csv: str, out_json_dir: str,
+              workers: Optional[int] = None, concurrency: int = TABLE_CONCURRENCY,
+              model: str = QWEN_MODEL, cache_db: Optional[str] = DEFAULT_CACHE_DB,
+              ollama_host: Optional[str] = None, pretty: bool = False,
+              io_bound: bool = False):
+    # scandir → DirEntry.path 를 바로 사용 (is_file 은 대부분 d_type 으로 판단, 추가 stat 없음)
+    with os.scandir(xml_dir) as it:
+        xml_files = sorted(
+            e.path for e in it
+            if e.name.lower().endswith(".xml") and e.is_file()
+        )
 
     logger.info(f"XML files found: {len(xml_files)}")
 
-    all_rows: List[Dict] = []
-
-    for path in tqdm(xml_files, desc="Processing XML"):
-        rows = process_single_xml(path, out_json_dir)
-        if rows:
-            all_rows.extend(rows)
-
-    if not all_rows:
+    # 1) XML parse + 문장 분할 + Figure/Table 후보 (파일끼리 독립)
+    #    - 기본: CPU 작업 → process pool (default: 전체 core)
+    #    - --io_bound: NFS/원격 storage 처럼 읽기 대기가 큰 경우 → thread pool (read/libxml2 parse 중 GIL 풀림)
+    if io_bound:
+        executor = ThreadPoolExecutor(max_workers=workers or 16)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    with executor as ex:
+        stage1 = list(tqdm(ex.map(stage1_extract, xml_files, chunksize=8),
+                           total=len(xml_files), desc="Stage1 (XML)"))
+
+    # 2) 모든 파일의 Table 후보를 하나로 모아서 QWEN 에 동시에 보냄 (서버 continuous batching)
+    #    규칙으로 확실한 후보(rule_table_label)는 LLM 에 보내지 않음
+    q_by_file: Dict[int, Dict] = {}
+    keys = []
+    windows = []
+    n_rule = 0
+    for fi, st in enumerate(stage1):
+        if st is None:
+            continue
+        for c in st[2]:
+            rule = rule_table_label(c[1])
+            if rule is not None:
+                q_by_file.setdefault(fi, {})[c[0]] = (c[1:], rule)
+                n_rule += 1
+                continue
+            keys.append((fi, c[0]))
+            windows.append(c[1:])
+    logger.info(f"Table candidates (all files): {n_rule + len(windows)} "
+                f"(rule: {n_rule}, Qwen: {len(windows)})")
+
+    #    같은 window 는 한 번만, 이전 실행에서 물어본 window 는 cache 에서 (LLM 호출 = unique 한 새 window 수)
+    answers: Dict[Tuple[str, str, str], Dict] = {}
+    conn = open_table_cache(cache_db) if cache_db else None
+    todo = []
+    for w in dict.fromkeys(windows):
+        hit = conn.execute("SELECT v FROM kv WHERE k=?", (table_cache_key(model, w),)).fetchone() if conn else None
+        if hit:
+            answers[w] = json_loads(hit[0])
+        else:
+            todo.append(w)
+    logger.info(f"Qwen windows: {len(windows)} (unique: {len(answers) + len(todo)}, "
+                f"cached: {len(answers)}, to query: {len(todo)})")
+
+    responses = []
+    if todo:
+        with tqdm(total=len(todo), desc="Stage2 (Qwen Table)") as pbar:
+            responses = asyncio.run(query_table_candidates(todo, concurrency, model, pbar, ollama_host))
+    answers.update(zip(todo, responses))
+
+    if conn:
+        # 호출 실패(ERROR)와 parse 실패(PARSE_ERROR, num_predict 에서 잘린 답 포함)는
+        # 다음 실행에서 다시 물어보도록 저장 안 함
+        conn.executemany(
+            "INSERT OR REPLACE INTO kv (k, v) VALUES (?, ?)",
+            [(table_cache_key(model, w), json.dumps(r, ensure_ascii=False))
+             for w, r in zip(todo, responses) if r["label"] not in ("ERROR", "PARSE_ERROR")],
+        )
+        conn.commit()
+        conn.close()
+
+    for (fi, idx), w in zip(keys, windows):
+        q_by_file.setdefault(fi, {})[idx] = (w, answers[w])
+
+    # 3) 파일별로 결과 합치기 + JSON 저장, CSV 는 파일 단위로 바로 흘려 씀 (전체 record 를 메모리에 모으지 않음)
+    n_rows = 0
+    type_counts: Counter = Counter()
+    label_counts: Counter = Counter()
+
+    with open(out_csv, "w", newline="", encoding="utf-8-sig") as fout:
+        writer = csv.DictWriter(fout, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+
+        for fi, (path, st) in enumerate(zip(xml_files, stage1)):
+            if st is None:
+                continue
+            n_sents, fig_caps, _ = st
+            rows = stage2_finalize(path, n_sents, fig_caps, q_by_file.get(fi, {}),
+                                   out_json_dir, pretty)
+            for r in rows:
+                type_counts[r["type"]] += 1
+                if r["table_label"] is not None:
+                    label_counts[r["table_label"]] += 1
+                # raw_window(list)는 CSV 에 JSON 문자열로
+                r = dict(r, raw_window=json.dumps(r["raw_window"], ensure_ascii=False))
+                writer.writerow(r)
+            n_rows += len(rows)
+
+    if not n_rows:
+        os.remove(out_csv)
         logger.warning("No captions detected in any file.")
         return
 
-    df = pd.DataFrame(all_rows)
-
-    # JSON 필드(raw_window 등)는 CSV에 그냥 문자열로 들어가게 둠
-    df.to_csv(out_csv, index=False, encoding="utf-8-sig")
     logger.info(f"Saved aggregated CSV → {out_csv}")
 
     # 간단 통계
-    logger.info("Type counts:\n%s", df["type"].value_counts())
-    if "table_label" in df.columns:
-        logger.info("Table label counts:\n%s", df["table_label"].value_counts())
+    logger.info("Type counts:\n%s", "\n".join(f"{k}\t{v}" for k, v in type_counts.most_common()))
+    logger.info("Table label counts:\n%s", "\n".join(f"{k}\t{v}" for k, v in label_counts.most_common()))
 
 
 # =========================================================
@@ -496,6 +757,46 @@ def parse_args():
         default=DEFAULT_OUT_JSON_DIR,
         help=f"XML별 JSON 결과 저장 폴더 (default: {DEFAULT_OUT_JSON_DIR})"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="XML 처리 worker 수 (default: os.cpu_count(), --io_bound 면 16)"
+    )
+    parser.add_argument(
+        "--io_bound",
+        action="store_true",
+        help="XML 읽기가 느린 storage(NFS 등)일 때 process 대신 thread pool 로 XML 처리"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=TABLE_CONCURRENCY,
+        help=f"동시에 보낼 Qwen 요청 수, OLLAMA_NUM_PARALLEL 과 맞출 것 (default: {TABLE_CONCURRENCY})"
+    )
+    parser.add_argument(
+        "--qwen_model",
+        type=str,
+        default=QWEN_MODEL,
+        help=f"Table 판별용 Ollama 모델 (default: {QWEN_MODEL})"
+    )
+    parser.add_argument(
+        "--pretty",
+        action="store_true",
+        help="XML별 JSON 을 indent=2 로 저장 (default: compact)"
+    )
+    parser.add_argument(
+        "--ollama_host",
+        type=str,
+        default=None,
+        help="Ollama 서버 주소 (default: OLLAMA_HOST 환경변수 또는 http://127.0.0.1:11434)"
+    )
+    parser.add_argument(
+        "--cache_db",
+        type=str,
+        default=DEFAULT_CACHE_DB,
+        help=f"Qwen Table 판별 결과 cache (SQLite, 빈 문자열이면 사용 안 함) (default: {DEFAULT_CACHE_DB})"
+    )
     return parser.parse_args()
 
 
@@ -509,6 +810,8 @@ if __name__ == "__main__":
     logger.info(f"XML dir: {args.xml_dir}")
     logger.info(f"Output CSV: {args.out_csv}")
     logger.info(f"Per-file JSON dir: {args.out_json_dir}")
-    logger.info(f"Qwen model: {QWEN_MODEL}")
+    logger.info(f"Qwen model: {args.qwen_model}")
 
-    run_batch(args.xml_dir, args.out_csv, args.out_json_dir)
+    run_batch(args.xml_dir, args.out_csv, args.out_json_dir,
+              args.workers, args.concurrency, args.qwen_model, args.cache_db,
+              args.ollama_host, args.pretty, args.io_bound)